@@ -49,15 +49,14 @@ def offset_from_centers(object_tracks, attribute_group: AttributeGroup, objects)
     lats2 = np.array(member_attributes[objects[1]]["core"]["latitude"])
     lons2 = np.array(member_attributes[objects[1]]["core"]["longitude"])
 
-    lats3, lons3, lats4, lons4 = [], [], [], []
-    # Re-order the arrays so that the ids match
-    for i in range(len(ids)):
-        lats3.append(lats1[ids_1 == ids[i]][0])
-        lons3.append(lons1[ids_1 == ids[i]][0])
-        lats4.append(lats2[ids_2 == ids[i]][0])
-        lons4.append(lons2[ids_2 == ids[i]][0])
-
-    args = [lats3, lons3, lats4, lons4]
+    # Re-order the arrays so that the ids match, using a single lookup per member
+    # object rather than comparing every member id against every grouped id
+    index_1 = {member_id: i for i, member_id in enumerate(ids_1.tolist())}
+    index_2 = {member_id: i for i, member_id in enumerate(ids_2.tolist())}
+    order_1 = np.array([index_1[i] for i in ids.tolist()], dtype=int)
+    order_2 = np.array([index_2[i] for i in ids.tolist()], dtype=int)
+
+    args = [lats1[order_1], lons1[order_1], lats2[order_2], lons2[order_2]]
     y_offsets, x_offsets = grid.geographic_to_cartesian_displacement(*args)
     # Convert to km
     y_offsets, x_offsets = y_offsets / 1000, x_offsets / 1000
@@ -1,5 +1,8 @@
 """General utilities for object attributes."""
 
+import functools
+import importlib.util
+from types import MappingProxyType
 from pydantic import ValidationError, ConfigDict
 import yaml
 from pathlib import Path
@@ -13,8 +16,22 @@ from thuner.log import setup_logger
 
 logger = setup_logger(__name__)
 
+# Use the multithreaded pyarrow csv reader when pyarrow is installed
+if importlib.util.find_spec("pyarrow") is not None:
+    _csv_engine = "pyarrow"
+else:
+    _csv_engine = "c"
 
-__all__ = ["read_attribute_csv", "AttributesRecord", "time_offset"]
+# Use the libyaml backed loader when available, which is much faster than pure python
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+__all__ = [
+    "read_attribute_csv",
+    "read_attribute_dataset",
+    "AttributesRecord",
+    "time_offset",
+]
 
 
 def get_ids(object_tracks, matched, member_object):
@@ -65,17 +82,59 @@ def get_nearest_points(
     return list(set(zip(ds_lats, ds_lons)))
 
 
-def _init_attr_type(attribute_type: AttributeType):
-    """Initialize attributes lists for a given attribute type."""
+class AttributeColumn:
+    """
+    Growable numpy buffer for accumulating the values of a single attribute. Values are
+    written directly into a typed array, whose capacity is doubled when full, rather
+    than appended to a list of python objects.
+    """
+
+    def __init__(self, data_type, capacity=256):
+        self._data = np.empty(capacity, dtype=numpy_data_type(data_type))
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def extend(self, values):
+        """Append a sequence of values to the column."""
+        values = np.asarray(values, dtype=self._data.dtype)
+        new_size = self._size + len(values)
+        if new_size > len(self._data):
+            capacity = max(new_size, 2 * len(self._data))
+            data = np.empty(capacity, dtype=self._data.dtype)
+            data[: self._size] = self._data[: self._size]
+            self._data = data
+        self._data[self._size : new_size] = values
+        self._size = new_size
+
+    def finalize(self):
+        """Return a view of the used portion of the buffer."""
+        return self._data[: self._size]
+
+
+def _init_attr_type(attribute_type: AttributeType, buffered=False):
+    """
+    Initialize attributes lists for a given attribute type. If buffered, initialize
+    AttributeColumn buffers instead of lists.
+    """
     attributes = {}
     for attr in attribute_type.attributes:
         if isinstance(attr, AttributeGroup):
-            for attr_attr in attr.attributes:
-                attributes[attr_attr.name] = []
+            members = attr.attributes
         elif isinstance(attr, Attribute):
-            attributes[attr.name] = []
+            members = [attr]
         else:
             raise ValueError(f"Unknown type {attr.type}.")
+        for member in members:
+            if buffered:
+                attributes[member.name] = AttributeColumn(member.data_type)
+            else:
+                attributes[member.name] = []
     return attributes
 
 
@@ -91,6 +150,8 @@ class AttributesRecord(BaseModel):
     name: str = None
     attribute_types: dict | None = None
     member_attributes: dict | None = None
+    # Whether to accumulate attributes in AttributeColumn buffers rather than lists
+    buffered: bool = False
 
     @model_validator(mode="after")
     def _check_name(cls, values):
@@ -105,27 +166,46 @@ class AttributesRecord(BaseModel):
         options = values.attribute_options
         if options is None:
             return values
+        buffered = values.buffered
         values.attribute_types = {}
         for attr_type in options.attribute_types:
-            values.attribute_types[attr_type.name] = _init_attr_type(attr_type)
+            attributes = _init_attr_type(attr_type, buffered)
+            values.attribute_types[attr_type.name] = attributes
         if options.member_attributes is not None:
             values.member_attributes = {}
             for obj, obj_attributes in options.member_attributes.items():
                 obj_attr = {}
                 for attr_type in obj_attributes.attribute_types:
-                    obj_attr[attr_type.name] = _init_attr_type(attr_type)
+                    obj_attr[attr_type.name] = _init_attr_type(attr_type, buffered)
                 values.member_attributes[obj] = obj_attr
         return values
 
 
+# Format used when writing times to attribute csv files
+time_format = "%Y-%m-%d %H:%M:%S"
+
 # Mapping of string representations to actual data types
-string_to_data_type = {
-    "float": float,
-    "int": int,
-    "datetime64[s]": "datetime64[s]",
-    "bool": bool,
-    "str": str,
-}
+string_to_data_type = MappingProxyType(
+    {
+        "float": float,
+        "int": int,
+        "datetime64[s]": "datetime64[s]",
+        "bool": bool,
+        "str": str,
+    }
+)
+
+# Numpy data types used to hold attributes in memory. String attributes are held as
+# objects to avoid fixed width numpy strings, which would convert None to "None".
+numpy_data_types = MappingProxyType(
+    {
+        float: np.dtype("float64"),
+        int: np.dtype("int64"),
+        bool: np.dtype("bool"),
+        np.datetime64: np.dtype("datetime64[s]"),
+        str: np.dtype("object"),
+    }
+)
 
 
 def time_offset():
@@ -186,47 +266,117 @@ def get_current_mask(object_tracks, matched=False):
     return mask
 
 
+@functools.lru_cache(maxsize=None)
+def _core_attribute_path(object_name, member_object, name):
+    """
+    Get the field of the current attributes record, and the keys within it, at which a
+    core attribute is stored. Cached as the path is fixed for each object and attribute.
+    """
+    # Check if grouped object
+    if member_object is not None and member_object != object_name:
+        return "member_attributes", (member_object, "core", name)
+    return "attribute_types", ("core", name)
+
+
 def attribute_from_core(attribute, object_tracks, member_object):
     """Get attribute from core object properties."""
-    # Check if grouped object
-    current_attributes = object_tracks.current_attributes
-    if member_object is not None and member_object is not object_tracks.name:
-        member_attr = current_attributes.member_attributes
-        attr = member_attr[member_object]["core"][attribute.name]
-    else:
-        core_attr = current_attributes.attribute_types["core"]
-        attr = core_attr[attribute.name]
+    args = [object_tracks.name, member_object, attribute.name]
+    field, keys = _core_attribute_path(*args)
+    attr = getattr(object_tracks.current_attributes, field)
+    for key in keys:
+        attr = attr[key]
     return {attribute.name: attr}
 
 
-def attributes_dataframe(recorded_attributes, attribute_type):
-    """Create a pandas DataFrame from object attributes dictionary."""
-
-    data_types = get_data_type_dict(attribute_type)
-    data_types.pop("time")
-    try:
-        df = pd.DataFrame(recorded_attributes).astype(data_types)
-    except:
-        pass
+@functools.lru_cache(maxsize=128)
+def dataframe_index(names):
+    """
+    Get the multi-index of the dataframe built from recorded attributes with the given
+    names. The attribute names are fixed for each attribute type, so the index is
+    cached rather than recomputed each time attributes are written.
+    """
     multi_index = ["time"]
-    if "time_offset" in recorded_attributes.keys():
+    if "time_offset" in names:
         multi_index.append("time_offset")
-    if "universal_id" in recorded_attributes.keys():
+    if "universal_id" in names:
         id_index = "universal_id"
     else:
         id_index = "id"
     multi_index.append(id_index)
-    if "altitude" in recorded_attributes.keys():
+    if "altitude" in names:
         multi_index.append("altitude")
+    return tuple(multi_index)
+
+
+def attributes_dataframe(recorded_attributes, attribute_type, sort=True):
+    """
+    Create a pandas DataFrame from object attributes dictionary. Attributes are recorded
+    one time step at a time, so rows are already in time order; set sort to False to
+    skip sorting the full multi-index, e.g. when the dataframe is sorted again on
+    aggregation.
+    """
+
+    data_types = get_data_type_dict(attribute_type)
+    # Build each column directly as a typed array, rather than casting a dataframe of
+    # python objects, which would walk and store the data twice
+    columns = {}
+    for name, values in recorded_attributes.items():
+        if isinstance(values, AttributeColumn):
+            values = values.finalize()
+        columns[name] = np.asarray(values, dtype=numpy_data_type(data_types[name]))
+    multi_index = list(dataframe_index(tuple(recorded_attributes.keys())))
+    if sort:
+        # Sort the index columns with lexsort before building the multi-index, which
+        # is much cheaper than sort_index. Note lexsort uses the last key as primary.
+        order = np.lexsort([columns[name] for name in reversed(multi_index)])
+        if np.any(np.diff(order) != 1):
+            columns = {name: values[order] for name, values in columns.items()}
+    df = pd.DataFrame(columns, copy=False)
     df.set_index(multi_index, inplace=True)
-    df.sort_index(inplace=True)
+    df = categorize_strings(df, data_types)
     return df
 
 
-def read_metadata_yml(filepath):
-    """Read metadata from a yml file."""
+def numpy_data_type(data_type):
+    """Get the numpy data type used to hold an attribute in memory."""
+    return numpy_data_types.get(data_type, data_type)
+
+
+def categorize_strings(df, data_types):
+    """
+    Store string attributes, e.g. classification tags, as pandas categoricals. Note
+    categoricals are only used for frames built in memory; str attributes are read back
+    from file as plain objects.
+    """
+    for name, data_type in data_types.items():
+        if data_type is str and name in df.columns:
+            df[name] = df[name].astype("category")
+    return df
+
+
+def read_data_types(data_types):
+    """
+    Get the data types used to read attribute files. Note str attributes are read as
+    plain strings rather than categoricals, as frames read from file are modified in
+    place, e.g. when relabelling id strings in thuner.parallel.
+    """
+    new_data_types = {}
+    for name, data_type in data_types.items():
+        if data_type is str:
+            new_data_types[name] = str
+        else:
+            new_data_types[name] = numpy_data_type(data_type)
+    return new_data_types
+
+
+@functools.lru_cache(maxsize=128)
+def _read_metadata_yml(filepath, modified_time):
+    """
+    Read and validate metadata from a yml file. Results are cached on the filepath and
+    modification time, so rewritten metadata files are read again.
+    """
     with open(filepath, "r") as file:
-        kwargs = yaml.safe_load(file)
+        kwargs = yaml.load(file, Loader=_Loader)
         try:
             attribute_type = AttributeType(**kwargs)
         except ValidationError:
@@ -235,6 +385,38 @@ def read_metadata_yml(filepath):
     return attribute_type
 
 
+def read_metadata_yml(filepath):
+    """Read metadata from a yml file."""
+    filepath = str(filepath)
+    attribute_type = _read_metadata_yml(filepath, Path(filepath).stat().st_mtime_ns)
+    if attribute_type is None:
+        return None
+    # Return a copy so callers cannot modify the cached attribute type
+    return attribute_type.model_copy(deep=True)
+
+
+def get_schema(attribute_type: AttributeType):
+    """
+    Get the data types, time attribute names, index names and attribute names of an
+    attribute type. Note the returned values are shared by cached calls of _read_schema,
+    so should not be modified.
+    """
+    data_types = get_data_type_dict(attribute_type)
+    time_attrs = [name for name, dtype in data_types.items() if dtype is np.datetime64]
+    indexes = get_indexes(attribute_type)
+    names = get_names(attribute_type)
+    return data_types, tuple(time_attrs), indexes, tuple(names)
+
+
+@functools.lru_cache(maxsize=128)
+def _read_schema(filepath, modified_time):
+    """Get the schema described by a metadata yml file, caching the result."""
+    attribute_type = _read_metadata_yml(filepath, modified_time)
+    if attribute_type is None:
+        return None
+    return get_schema(attribute_type)
+
+
 def get_indexes(attribute_type: AttributeType):
     """Get the indexes for the attribute DataFrame."""
     all_indexes = ["time", "time_offset", "event_start", "universal_id", "id"]
@@ -268,74 +450,161 @@ def read_attribute_csv(
         DataFrame containing the CSV data.
     """
 
-    filepath = Path(filepath)
+    if dask and isinstance(filepath, (list, tuple)):
+        # Multiple files, e.g. the interval files of one attribute type, share metadata.
+        # Interval files are named by start time, so sorting puts them in time order.
+        filepaths = sorted(str(fp) for fp in filepath)
+        filepath = Path(filepaths[0])
+    else:
+        filepath = Path(filepath)
+        filepaths = str(filepath)
 
-    data_types = None
+    schema = None
     if attribute_type is None:
         try:
-            meta_path = filepath.with_suffix(".yml")
-            attribute_type = read_metadata_yml(meta_path)
-            data_types = get_data_type_dict(attribute_type)
+            meta_path = str(filepath.with_suffix(".yml"))
+            schema = _read_schema(meta_path, Path(meta_path).stat().st_mtime_ns)
         except FileNotFoundError:
             logger.warning("No metadata file found for %s.", filepath)
         except ValidationError:
             logger.warning("Invalid metadata file found for %s.", filepath)
-        except AttributeError:
-            logger.warning("Invalid metadata file found for %s.", filepath)
+    else:
+        schema = get_schema(attribute_type)
 
-    if attribute_type is None:
+    if schema is None:
         message = "No metadata; loading entire dataframe and data types not enforced."
         logger.warning(message)
         kwargs = {"na_values": ["", "NA"], "keep_default_na": True}
         if dask:
-            df = dd.read_csv(filepath, **kwargs)
+            df = dd.read_csv(filepaths, **kwargs)
         else:
             df = pd.read_csv(filepath, **kwargs)
         return df
 
-    # Get attributes with np.datetime64 data type
-    time_attrs = []
-    for attribute in attribute_type.attributes:
-        if isinstance(attribute, AttributeGroup):
-            for attr in attribute.attributes:
-                if attr.data_type is np.datetime64:
-                    time_attrs.append(attr.name)
-        else:
-            if attribute.data_type is np.datetime64:
-                time_attrs.append(attribute.name)
-
-    indexes = get_indexes(attribute_type)
+    all_data_types, time_attrs, indexes, names = schema
     if columns is None:
-        columns = get_names(attribute_type)
+        columns = names
     all_columns = indexes + [col for col in columns if col not in indexes]
-    data_types = get_data_type_dict(attribute_type)
     # Remove time columns as pd handles these separately
-    for name in time_attrs:
-        data_types.pop(name, None)
-    if times is not None and not dask:
-        kwargs = {"usecols": ["time"], "parse_dates": time_attrs}
-        kwargs.update({"na_values": ["", "NA"], "keep_default_na": True})
-        index_df = pd.read_csv(filepath, **kwargs)
-        row_numbers = index_df[~index_df["time"].isin(times)].index.tolist()
-        # Increment row numbers by 1 to account for header
-        row_numbers = [i + 1 for i in row_numbers]
-    else:
-        if dask:
-            logger.warning("Row skipping not yet implemented with dask dataframes.")
-        row_numbers = None
+    data_types = {k: v for k, v in all_data_types.items() if k not in time_attrs}
+    data_types = read_data_types(data_types)
+    na_kwargs = {"na_values": ["", "NA"], "keep_default_na": True}
 
+    data_types = {k: v for k, v in data_types.items() if k in all_columns}
+    kwargs = {"usecols": all_columns, "dtype": data_types, **na_kwargs}
     if dask:
-        kwargs = {"dtype": data_types, "parse_dates": time_attrs}
-        kwargs.update({"na_values": ["", "NA"], "keep_default_na": True})
-        df = dd.read_csv(filepath, **kwargs)
-        message = "Index not set for dask dataframe."
-        logger.warning(message)
+        return read_dask(filepaths, time_attrs, times=times, **kwargs)
+
+    # Times are parsed after reading rather than using parse_dates, as pd.to_datetime
+    # with an explicit format and cache=True only parses each unique time string once.
+    if _csv_engine == "pyarrow":
+        # The multithreaded pyarrow reader does not support skipping specific rows, so
+        # subset rows after reading.
+        df = pd.read_csv(filepath, engine="pyarrow", **kwargs)
+        df = parse_times(df, time_attrs)
+        if times is not None:
+            df = df[df["time"].isin(times)].reset_index(drop=True)
     else:
-        kwargs = {"usecols": all_columns, "dtype": data_types}
-        kwargs.update({"parse_dates": time_attrs, "skiprows": row_numbers})
-        kwargs.update({"na_values": ["", "NA"], "keep_default_na": True})
-        df = pd.read_csv(filepath, **kwargs)
-        df = df.set_index(indexes)
+        if times is not None:
+            index_kwargs = {"usecols": ["time"], **na_kwargs}
+            index_df = parse_times(pd.read_csv(filepath, **index_kwargs), ["time"])
+            row_numbers = index_df[~index_df["time"].isin(times)].index.tolist()
+            # Increment row numbers by 1 to account for header
+            row_numbers = [i + 1 for i in row_numbers]
+        else:
+            row_numbers = None
+        kwargs.update({"skiprows": row_numbers})
+        df = parse_times(pd.read_csv(filepath, **kwargs), time_attrs)
+    df = df.set_index(indexes)
+    return df
+
+
+def arrow_data_type(data_type):
+    """Get the pyarrow data type used to read an attribute."""
+    import pyarrow as pa
+
+    arrow_data_types = {float: pa.float64(), int: pa.int64(), bool: pa.bool_()}
+    arrow_data_types.update({str: pa.string(), np.datetime64: pa.timestamp("s")})
+    return arrow_data_types[data_type]
+
+
+def read_attribute_dataset(directory, attribute_type: AttributeType, columns=None):
+    """
+    Read a directory of attribute csv files, e.g. the interval files written during
+    tracking, as a single table using pyarrow.dataset. The schema is built once from the
+    attribute type and the files are read in parallel, rather than parsing metadata,
+    headers and data types separately for each file. Columns are then converted to the
+    data types read_attribute_csv returns, so both readers give the same dataframe.
+
+    Parameters
+    ----------
+    directory : str
+        Directory containing the csv files.
+    attribute_type : AttributeType
+        Attribute type describing the csv files.
+    columns : list of str, optional
+        Attribute columns to read. Index columns are always read.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame containing the data of all the csv files.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as pa_dataset
+
+    all_data_types, time_attrs, indexes, names = get_schema(attribute_type)
+    if columns is None:
+        columns = names
+    all_columns = indexes + [col for col in columns if col not in indexes]
+    filepaths = sorted(str(filepath) for filepath in Path(directory).glob("*.csv"))
+    # Read times as strings, so they are parsed by parse_times as in read_attribute_csv
+    fields = []
+    for name, dtype in all_data_types.items():
+        dtype = str if name in time_attrs else dtype
+        fields.append((name, arrow_data_type(dtype)))
+    kwargs = {"null_values": ["", "NA"], "strings_can_be_null": True}
+    file_format = pa_dataset.CsvFileFormat(
+        convert_options=pa_csv.ConvertOptions(**kwargs)
+    )
+    kwargs = {"format": file_format, "schema": pa.schema(fields)}
+    dataset = pa_dataset.dataset(filepaths, **kwargs)
+    df = dataset.to_table(columns=all_columns).to_pandas()
+    # Convert columns to the same data types read_attribute_csv uses
+    data_types = {k: v for k, v in all_data_types.items() if k not in time_attrs}
+    data_types = read_data_types(data_types)
+    df = df.astype({k: v for k, v in data_types.items() if k in all_columns})
+    df = parse_times(df, time_attrs)
+    return df.set_index(indexes)
+
+
+def read_dask(filepaths, time_attrs, times=None, **kwargs):
+    """
+    Read attribute csv files into a dask dataframe. Each file is read as a single
+    partition, and as attribute files are written in time order, time is set as the
+    index without a shuffle. The remaining index levels are kept as ordinary columns,
+    as dask does not support multi-indexes, so groupbys over time and id run within
+    partitions.
+    """
+    df = dd.read_csv(filepaths, blocksize=None, **kwargs)
+    for name in time_attrs:
+        if name in df.columns:
+            df[name] = dd.to_datetime(df[name], format=time_format)
+    if times is not None:
+        df = df[df["time"].isin(list(times))]
+    return df.set_index("time", sorted=True)
+
+
+def parse_times(df, time_attrs):
+    """
+    Convert the time columns of an attribute dataframe to datetime64[ns]. The unit is
+    set explicitly, as the pyarrow csv engine parses times itself, at second resolution.
+    """
+    for name in time_attrs:
+        if name in df.columns:
+            times = pd.to_datetime(df[name], format=time_format, cache=True)
+            df[name] = times.astype("datetime64[ns]")
     return df
 
 
@@ -4,8 +4,17 @@ Handle package configuration. Tracking options are handled by the options module
 
 import os
 import json
+import functools
 from pathlib import Path
 
+# Use orjson to parse the configuration file when available, falling back to json
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 __all__ = ["set_outputs_directory", "get_outputs_directory"]
 
 
@@ -23,6 +32,7 @@ def create_user_config(output_directory=Path.home() / "THUNER_output"):
     return str(config_path)
 
 
+@functools.lru_cache(maxsize=1)
 def get_config_path():
     """Get the default path to the THUNER configuration file."""
     if os.name == "nt":  # Windows
@@ -41,9 +51,7 @@ def get_config_path():
 def read_config(config_path):
     config_path = Path(config_path)
     if config_path.exists():
-        with open(config_path, "r") as f:
-            config = json.load(f)
-            return config
+        return _loads(config_path.read_bytes())
     else:
         message = f"{config_path} not found. Ensure write_config has been run first."
         raise FileNotFoundError(message)
@@ -70,10 +78,16 @@ def write_config(config):
     with open(config_path, "w") as f:
         json.dump(config, f, indent=4)
         print(f"Created THUNER configuration file at {config_path}")
+    # Ensure the cached outputs directory reflects the new configuration
+    get_outputs_directory.cache_clear()
 
 
+@functools.lru_cache(maxsize=1)
 def get_outputs_directory():
-    """Load the THUNER outputs directory from the configuration file."""
+    """
+    Load the THUNER outputs directory from the configuration file. The result is cached
+    until the configuration is rewritten by write_config.
+    """
 
     try:
         config_path = get_config_path()
@@ -19,11 +19,15 @@ else:
     message += "If you need regridding, consider using a Linux or MacOS system."
     print(message)
 
+import functools
+import collections
 import multiprocessing
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import subprocess
 import zipfile
 import time
+import hashlib
 from pathlib import Path
 import requests
 import cdsapi
@@ -164,10 +168,27 @@ def get_header(url, filepath):
     return already_downloaded, resume_header
 
 
-def download(url, parent_remote, parent_local, max_retries=10, retry_delay=2):
+# Session shared by downloads, so sequential downloads reuse keep-alive connections
+# rather than opening a new connection and TLS handshake per file
+_session = None
+
+
+def get_session():
+    """Get the shared download session, creating it on first use."""
+    global _session
+    if _session is None:
+        _session = pooled_session(8)
+    return _session
+
+
+def download(
+    url, parent_remote, parent_local, max_retries=10, retry_delay=2, session=None
+):
     """
     Downloads a file from the given URL and saves it to the specified directory,
-    preserving the subdirectory structure of the remote filesystem.
+    preserving the subdirectory structure of the remote filesystem. Connections are
+    reused across downloads via a shared requests.Session, unless another session is
+    passed.
     """
 
     filepath = Path(url_to_filepath(url, parent_remote, parent_local))
@@ -184,7 +205,8 @@ def download(url, parent_remote, parent_local, max_retries=10, retry_delay=2):
         try:
             already_downloaded, resume_header = get_header(url, filepath)
             logger.info("Sending HTTP request to %s.", url)
-            response = requests.get(url, headers=resume_header, stream=True, timeout=10)
+            kwargs = {"headers": resume_header, "stream": True, "timeout": 10}
+            response = (session or get_session()).get(url, **kwargs)
             handle_response(response, already_downloaded, filepath)
             return str(filepath)
         except Exception as e:
@@ -197,6 +219,58 @@ def download(url, parent_remote, parent_local, max_retries=10, retry_delay=2):
                 raise requests.exceptions.RequestException(message)
 
 
+def pooled_session(max_connections):
+    """
+    Get a requests.Session whose connection pool is large enough for max_connections
+    concurrent downloads, so connections are reused rather than reopened per file.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def existing_filepaths(filepaths, max_workers=8):
+    """
+    Get the filepaths that exist, checking them concurrently. Each check is a stat
+    call, which on network filesystems is dominated by latency rather than CPU, so
+    the checks overlap well across threads.
+    """
+    if len(filepaths) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(filepaths))) as executor:
+        exists = list(executor.map(os.path.exists, filepaths))
+    return [filepath for filepath, cond in zip(filepaths, exists) if cond]
+
+
+def download_many(urls, parent_remote, parent_local, max_workers=4):
+    """
+    Download files concurrently, sharing a pooled requests.Session. Note each request
+    still waits its turn via the DownloadState lock file, so requests remain spaced
+    out, but the downloads themselves overlap. Files are yielded as their downloads
+    finish, so callers can process early files while later files download.
+
+    Yields
+    ------
+    index, filepath : tuple
+        The index of the url in urls, and the local filepath of the downloaded file,
+        in the order downloads finish.
+    """
+    if len(urls) == 0:
+        return
+    max_workers = min(max_workers, len(urls))
+    with pooled_session(max_workers) as session:
+        args = [parent_remote, parent_local]
+        kwargs = {"session": session}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {}
+            for i, url in enumerate(urls):
+                futures[executor.submit(download, url, *args, **kwargs)] = i
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
 def unzip_file(filepath, directory=None):
     """
     Downloads a .zip file from a URL, extracts the contents of the .zip file into
@@ -234,6 +308,53 @@ def unzip_file(filepath, directory=None):
     return sorted(extracted_filepaths), dir_size
 
 
+def read_zip_members(filepath):
+    """
+    Read the files in a .zip archive into memory one at a time, without extracting them
+    to disk. Members are yielded in name order, so only one is resident at a time.
+
+    Yields
+    ------
+    name : str
+        The name of the member within the archive.
+    contents : bytes
+        The uncompressed contents of the member.
+    """
+    with zipfile.ZipFile(filepath, "r") as zip_ref:
+        infos = zip_ref.infolist()
+        members = sorted(info.filename for info in infos if not info.is_dir())
+        for name in members:
+            yield name, zip_ref.read(name)
+
+
+def process_pool_workers(max_workers):
+    """
+    Get the number of processes to use in a process pool, with None meaning all
+    available cores. Daemonic processes, e.g. the workers of a multiprocessing.Pool,
+    cannot start child processes, so in those 1 is returned, i.e. work in the current
+    process.
+    """
+    if multiprocessing.current_process().daemon:
+        return 1
+    return max_workers or os.cpu_count() or 1
+
+
+def map_bounded(executor, function, iterable, *args, window=1):
+    """
+    Map function over iterable using executor, with at most window tasks in flight.
+    Items are only drawn from iterable as earlier tasks finish, so a lazy iterable,
+    e.g. from read_zip_members, never has more than window items resident at once.
+    Results are yielded in the order of iterable.
+    """
+    pending = collections.deque()
+    for item in iterable:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, item, *args))
+    while pending:
+        yield pending.popleft().result()
+
+
 def check_valid_url(url):
 
     if not isinstance(url, str):
@@ -278,6 +399,35 @@ def get_directory_size(directory):
         total /= 1024.0
 
 
+# Background reads of the files following those currently being converted
+_prefetch_executor = ThreadPoolExecutor(max_workers=1)
+_prefetched = {}
+
+
+def read_prefetched(filepath, filepaths, read, *args):
+    """
+    Get read(filepath, *args), then start reading the file following filepath in
+    filepaths in the background, so reading files overlaps with conversion and
+    tracking. The read function should load the data into memory and close the file.
+    """
+    future, prefetched_args = _prefetched.pop((read, filepath), (None, None))
+    # Discard any reads that will not be used, e.g. if files are accessed out of order
+    for key in [key for key in _prefetched if key[0] is read]:
+        _prefetched.pop(key)
+    if future is not None and prefetched_args == args:
+        dataset = future.result()
+    else:
+        dataset = read(filepath, *args)
+    try:
+        next_filepath = filepaths[filepaths.index(filepath) + 1]
+    except (ValueError, IndexError, TypeError, AttributeError):
+        next_filepath = None
+    if next_filepath is not None:
+        future = _prefetch_executor.submit(read, next_filepath, *args)
+        _prefetched[(read, next_filepath)] = (future, args)
+    return dataset
+
+
 def consolidate_netcdf(filepaths, fields=None, concat_dim="time"):
     """
     Consolidate multiple netCDF files into a single xarray dataset.
@@ -300,13 +450,12 @@ def consolidate_netcdf(filepaths, fields=None, concat_dim="time"):
 
     """
     datasets = []
-    if fields is None:
-        fields = xr.open_dataset(filepaths[0]).data_vars.keys()
-
     for filepath in filepaths:
-        dataset = xr.open_dataset(filepath)
-        dataset = dataset[fields]
-        datasets.append(dataset)
+        # Read each file once, in a single pass, and close it straight away
+        with xr.open_dataset(filepath) as dataset:
+            if fields is None:
+                fields = list(dataset.data_vars.keys())
+            datasets.append(dataset[fields].load())
 
     logger.info("Concatenating datasets along %s.", concat_dim)
     dataset = xr.concat(datasets, dim=concat_dim)
@@ -411,35 +560,73 @@ def log_convert(local_logger, name, filepath):
     local_logger.info("Converting %s data from %s", name, Path(filepath).name)
 
 
-def call_ncks(input_filepath, output_filepath, start, end, lat_range, lon_range):
-    """Call ncks to subset a large netcdf file."""
-    # Read metadata using xr with lazy loading.
-    ds = xr.open_dataset(input_filepath, chunks={})
-    # Check if time variable "time" or "valid_time". If "valid_time" convert to "time".
-    if "valid_time" in ds:
-        time_var = "valid_time"
-    else:
-        time_var = "time"
-    # Ensure start and end times are within the dataset time range.
-    time = ds[time_var].values
-    if start < time[0]:
-        start = time[0]
-    if end > time[-1]:
-        end = time[-1]
-
-    lon_range = [(lon + 180) % 360 - 180 for lon in lon_range]
-    command = (
-        f"ncks -d {time_var},{start},{end} "
-        f"-d latitude,{lat_range[0]},{lat_range[1]} "
-        f"-d longitude,{lon_range[0]},{lon_range[1]} "
-        f"{input_filepath} {output_filepath}"
-    )
-    result = subprocess.run(command, shell=True, check=True)
-    if result.returncode != 0:
-        logger.error("ncks failed with return code %d.", result.returncode)
-        logger.error("Standard output: %s", result.stdout)
-        logger.error("Standard error: %s", result.stderr)
-        raise subprocess.CalledProcessError(result.returncode, command)
+@functools.lru_cache(maxsize=8)
+def _linear_weights(source_bytes, target_bytes):
+    """
+    Get the lower indices and weights for linearly interpolating from the source to the
+    target coordinates, and a mask of targets outside the source range. Cached as the
+    altitude levels are typically fixed for a run.
+    """
+    source = np.frombuffer(source_bytes, dtype=float)
+    target = np.frombuffer(target_bytes, dtype=float)
+    indices = np.searchsorted(source, target, side="right") - 1
+    indices = np.clip(indices, 0, len(source) - 2)
+    lower, upper = source[indices], source[indices + 1]
+    weights = (target - lower) / (upper - lower)
+    outside = (target < source[0]) | (target > source[-1])
+    return indices, weights, outside
+
+
+def interp_altitude(ds, altitude):
+    """
+    Linearly interpolate a dataset to new altitudes, equivalent to
+    ds.interp(altitude=altitude, method="linear"). The interpolation indices and weights
+    are computed once for each pair of source and target altitudes, and applied to each
+    variable with numpy.
+    """
+    source = np.asarray(ds["altitude"].values, dtype=float)
+    target = np.asarray(altitude, dtype=float)
+    if len(source) < 2 or np.any(np.diff(source) <= 0):
+        return ds.interp(altitude=altitude, method="linear")
+    args = [source.tobytes(), target.tobytes()]
+    indices, weights, outside = _linear_weights(*args)
+    new_ds = ds.isel(altitude=indices)
+    for name, variable in ds.data_vars.items():
+        if "altitude" not in variable.dims:
+            continue
+        if not np.issubdtype(variable.dtype, np.number):
+            continue
+        axis = variable.dims.index("altitude")
+        data = variable.values
+        if not np.issubdtype(data.dtype, np.floating):
+            data = data.astype(float)
+        shape = [1] * data.ndim
+        shape[axis] = len(target)
+        lower = np.take(data, indices, axis=axis)
+        var_weights = weights.astype(data.dtype).reshape(shape)
+        # Accumulate into a single output array, rather than allocating a temporary
+        # for each step of lower + weights * (upper - lower)
+        new_data = np.take(data, indices + 1, axis=axis)
+        new_data -= lower
+        new_data *= var_weights
+        new_data += lower
+        np.copyto(new_data, np.nan, where=outside.reshape(shape))
+        new_ds[name] = new_ds[name].copy(data=new_data)
+    return new_ds.assign_coords(altitude=target)
+
+
+# Variables describing the domain itself, which are never masked
+_unmasked_variables = frozenset(["gridcell_area", "domain_mask", "boundary_mask"])
+
+
+def mask_variables(ds, dims):
+    """Get the variables of a dataset to mask, i.e. those with horizontal dimensions."""
+    dims = frozenset(dims)
+    variables = []
+    for name, variable in ds.data_vars.items():
+        if name not in _unmasked_variables and dims.issubset(variable.dims):
+            variables.append(name)
+    return variables
 
 
 def apply_mask(ds, grid_options):
@@ -451,23 +638,32 @@ def apply_mask(ds, grid_options):
         dims = ["latitude", "longitude"]
     else:
         raise ValueError("Grid name must be 'cartesian' or 'geographic'.")
-    for var in ds.data_vars.keys() - ["gridcell_area", "domain_mask", "boundary_mask"]:
-        # Check if the variable has horizontal dimensions
-        if not set(dims).issubset(set(ds[var].dims)):
-            continue
-        # Otherwise apply the mask
-        broadcasted_mask = domain_mask.broadcast_like(ds[var])
+    mask = domain_mask.transpose(*dims).values.astype(bool)
+    float_types = [np.floating, np.complexfloating]
+    int_types = [np.integer, np.bool_]
+    for var in mask_variables(ds, dims):
+        var_dims = ds[var].dims
+        # Rather than broadcasting the mask to each variable with xarray, insert axes
+        # so numpy broadcasts the mask without copying it
+        if var_dims.index(dims[0]) > var_dims.index(dims[1]):
+            var_mask = mask.T
+        else:
+            var_mask = mask
+        index = tuple(slice(None) if d in dims else np.newaxis for d in var_dims)
+        var_mask = var_mask[index]
         # Apply the mask, setting unmasked values to NaN or 0 as appropriate
         dtype = ds[var].dtype
-        float_types = [np.floating, np.complexfloating]
-        int_types = [np.integer, np.bool_]
         if any(np.issubdtype(dtype, parent_type) for parent_type in float_types):
-            ds[var] = ds[var].where(broadcasted_mask)
+            fill_value = np.array(np.nan, dtype=dtype)
         elif any(np.issubdtype(dtype, parent_type) for parent_type in int_types):
-            ds[var] = ds[var].where(broadcasted_mask, 0)
+            fill_value = np.array(0, dtype=dtype)
         else:
             message = f"Cannot apply domain mask to {var}. Unknown data type."
             raise ValueError(message)
+        # Note the fill value has the variable's dtype, so bool variables stay bool.
+        # The mask is not applied in place, as the caller may share the data buffer.
+        data = np.where(var_mask, ds[var].data, fill_value)
+        ds[var] = ds[var].copy(data=data)
     return ds
 
 
@@ -527,20 +723,43 @@ def smooth_mask(mask):
     return mask
 
 
+@functools.lru_cache(maxsize=8)
+def _cartesian_distances(y_bytes, x_bytes):
+    """Get distances from the grid origin. Cached as the grid is fixed for a run."""
+    y = np.frombuffer(y_bytes, dtype=float)
+    x = np.frombuffer(x_bytes, dtype=float)
+    X, Y = np.meshgrid(x, y)
+    distances = np.sqrt(X**2 + Y**2)
+    distances.flags.writeable = False
+    return distances
+
+
+@functools.lru_cache(maxsize=8)
+def _geographic_distances(lats_bytes, lons_bytes, origin_latitude, origin_longitude):
+    """Get distances from the radar origin. Cached as the grid is fixed for a run."""
+    lats = np.frombuffer(lats_bytes, dtype=float)
+    lons = np.frombuffer(lons_bytes, dtype=float)
+    LON, LAT = np.meshgrid(lons, lats)
+    distances = utils.haversine(LAT, LON, origin_latitude, origin_longitude)
+    distances.flags.writeable = False
+    return distances
+
+
 def mask_from_range(dataset, dataset_options, grid_options):
     """Create domain mask for gridcells greater than range from central point."""
     if grid_options.name == "cartesian":
-        X, Y = np.meshgrid(grid_options.x, grid_options.y)
-        distances = np.sqrt(X**2 + Y**2)
+        y = np.asarray(grid_options.y, dtype=float)
+        x = np.asarray(grid_options.x, dtype=float)
+        distances = _cartesian_distances(y.tobytes(), x.tobytes())
         coords = {"y": dataset.y, "x": dataset.x}
         dims = {"y": dataset.y, "x": dataset.x}
     elif grid_options.name == "geographic":
-        lons = grid_options.longitude
-        lats = grid_options.latitude
+        lats = np.asarray(grid_options.latitude, dtype=float)
+        lons = np.asarray(grid_options.longitude, dtype=float)
         origin_longitude = float(dataset.attrs["origin_longitude"])
         origin_latitude = float(dataset.attrs["origin_latitude"])
-        LON, LAT = np.meshgrid(lons, lats)
-        distances = utils.haversine(LAT, LON, origin_latitude, origin_longitude)
+        args = [lats.tobytes(), lons.tobytes(), origin_latitude, origin_longitude]
+        distances = _geographic_distances(*args)
         coords = {"latitude": dataset.latitude, "longitude": dataset.longitude}
         dims = {"latitude": dataset.latitude, "longitude": dataset.longitude}
     else:
@@ -562,32 +781,83 @@ def get_encoding(ds):
     return encoding
 
 
+# Regridders built during this session, keyed on the source and target grids
+_regridders = {}
+_max_regridders = 8
+
+
+def grid_key(*arrays):
+    """Get a hashable key identifying a set of coordinate arrays."""
+    key = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array, dtype=float)
+        key.update(str(array.shape).encode())
+        key.update(array.tobytes())
+    return key.hexdigest()
+
+
+def get_weights_directory():
+    """Get the directory for regridder weights shared between runs."""
+    return get_outputs_directory() / "regridder_weights"
+
+
 def get_geographic_regridder(
     dataset, grid_options, dataset_options, latitude=None, longitude=None
 ):
-    """Load an xesmf using stored weights if present."""
-    # Can probably abstract this part
+    """
+    Get an xesmf regridder. Regridders are kept in memory and reused while the source and
+    target grids are unchanged. Otherwise, if dataset_options.reuse_regridder is True,
+    weights are loaded from a file named by a hash of the grids, so later runs and
+    processes with the same grids skip building the weights.
+    """
     weights_filepath = dataset_options.weights_filepath
     if latitude is None or longitude is None:
         latitude, longitude = grid_options.latitude, grid_options.longitude
+    source_coords = [dataset["latitude"].values, dataset["longitude"].values]
+    key = grid_key(*source_coords, latitude, longitude)
+    if key in _regridders:
+        return _regridders[key]
     dims_dict = {"latitude": latitude, "longitude": longitude}
     dims = ["latitude", "longitude"]
     ds = xr.Dataset({dim: ([dim], dims_dict[dim]) for dim in dims})
     regrid_options = {"periodic": False, "extrap_method": None}
-    if not Path(weights_filepath).exists():
-        logger.info("Building regridder; this can take a while for large grids.")
+    reuse = dataset_options.reuse_regridder
+    # Only look up the shared weights directory if the weights are reused
+    cached_filepath = get_weights_directory() / f"{key}.nc" if reuse else None
+    if reuse and cached_filepath.exists():
+        logger.info("Loading regridder weights from %s.", cached_filepath)
+        regrid_options["weights"] = str(cached_filepath)
         regridder = xe.Regridder(dataset, ds, "bilinear", **regrid_options)
-        if dataset_options.reuse_regridder:
-            Path(weights_filepath).parent.mkdir(parents=True, exist_ok=True)
-            regridder.to_netcdf(weights_filepath)
-            # The filepath now exists, so the else case called next time
-    else:
+    elif weights_filepath is not None and Path(weights_filepath).exists():
         logger.info("Loading regridder weights from file.")
         regrid_options["weights"] = weights_filepath
         regridder = xe.Regridder(dataset, ds, "bilinear", **regrid_options)
+    else:
+        logger.info("Building regridder; this can take a while for large grids.")
+        regridder = xe.Regridder(dataset, ds, "bilinear", **regrid_options)
+        if reuse:
+            save_weights(regridder, cached_filepath)
+            if weights_filepath is not None:
+                save_weights(regridder, weights_filepath)
+    if len(_regridders) >= _max_regridders:
+        # Discard the oldest regridder
+        _regridders.pop(next(iter(_regridders)))
+    _regridders[key] = regridder
     return regridder
 
 
+def save_weights(regridder, filepath):
+    """
+    Save regridder weights. Weights are written to a temporary file first, so other
+    processes never load a partially written file.
+    """
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    tmp_filepath = filepath.with_suffix(f".{os.getpid()}.tmp")
+    regridder.to_netcdf(tmp_filepath)
+    tmp_filepath.replace(filepath)
+
+
 def copy_attributes(ds, old_ds):
     """Copy attributes from one xarray dataset to another."""
     for var in ds.data_vars:
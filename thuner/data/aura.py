@@ -10,9 +10,11 @@ else:
     message += "If you need regridding, consider using a Linux or MacOS system."
     print(message)
 
-import copy
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from urllib.parse import urlparse
+from pathlib import Path
 import xarray as xr
+import h5netcdf
 import numpy as np
 import pandas as pd
 from typing import Literal
@@ -49,6 +51,11 @@ class AURAOptions(utils.BaseDatasetOptions):
     range_units: str = Field("km", description="Units of the range.")
 
 
+# Bounds of the CPOL record, parsed once rather than on every validation
+_cpol_record_start = np.datetime64("1998-12-06T00:00:00")
+_cpol_record_end = np.datetime64("2017-05-02T00:00:00")
+
+
 class CPOLOptions(AURAOptions):
     """Options for CPOL datasets."""
 
@@ -80,9 +87,9 @@ class CPOLOptions(AURAOptions):
 
     @model_validator(mode="after")
     def _check_times(cls, values):
-        if np.datetime64(values.start) < np.datetime64("1998-12-06T00:00:00"):
+        if np.datetime64(values.start) < _cpol_record_start:
             raise ValueError("start must be 1998-12-06 or later.")
-        if np.datetime64(values.end) > np.datetime64("2017-05-02T00:00:00"):
+        if np.datetime64(values.end) > _cpol_record_end:
             raise ValueError("end must be 2017-05-02 or earlier.")
         return values
 
@@ -111,8 +118,7 @@ def get_cpol_filepaths(options: CPOLOptions):
 
     if options.level == "1b":
 
-        times = np.arange(start, end + np.timedelta64(10, "m"), np.timedelta64(10, "m"))
-        times = pd.DatetimeIndex(times)
+        times = pd.date_range(start, end, freq="10min")
 
         base_url += f"/cpol_level_1b/{options.version}/"
         if "grid" in options.data_format:
@@ -123,14 +129,12 @@ def get_cpol_filepaths(options: CPOLOptions):
                 data_format_string = "grid75"
         elif options.data_format == "ppi":
             base_url += "ppi/"
-        for time in times:
-            filepath = (
-                f"{base_url}{time.year}/{time.year}{time.month:02}{time.day:02}/"
-                f"twp10cpol{data_format_string}.b2."
-                f"{time.year}{time.month:02}{time.day:02}."
-                f"{time.hour:02}{time.minute:02}{time.second:02}.nc"
-            )
-            filepaths.append(filepath)
+        # Format all times at once, then concatenate the filepath pieces elementwise,
+        # rather than formatting each filepath in a python loop
+        directories = times.strftime("%Y/%Y%m%d/")
+        stamps = times.strftime("%Y%m%d.%H%M%S")
+        filename = f"twp10cpol{data_format_string}.b2."
+        filepaths = list(base_url + directories + filename + stamps + ".nc")
     # elif options.level == "2":
     #     times = np.arange(
     #         start.astype("datetime64[D]"),
@@ -188,27 +192,23 @@ def get_operational_filepaths(options: OperationalOptions):
     zipped ODIM files, level 1b are zipped netcdf files.
     """
 
-    start = np.datetime64(options["start"])
-    end = np.datetime64(options["end"])
+    start = np.datetime64(options.start).astype("datetime64[D]")
+    end = np.datetime64(options.end).astype("datetime64[D]")
 
     urls = []
     base_url = f"{utils.get_parent(options)}"
 
-    times = np.arange(start, end + np.timedelta64(1, "D"), np.timedelta64(1, "D"))
-    times = pd.DatetimeIndex(times)
-
-    if options["level"] == "1":
-        base_url += f"/{options['radar']}"
-        for time in times:
-            url = f"{base_url}/{time.year:04}/vol/{options['radar']}"
-            url += f"_{time.year}{time.month:02}{time.day:02}.pvol.zip"
-            urls.append(url)
-    elif options["level"] == "1b":
-        base_url += f"/level_1b/{options['radar']}/grid"
-        for time in times:
-            url = f"{base_url}/{time.year:04}/{options['radar']}"
-            url += f"_{time.year}{time.month:02}{time.day:02}_grid.zip"
-            urls.append(url)
+    times = pd.date_range(start, end, freq="D")
+    years, dates = times.strftime("%Y"), times.strftime("%Y%m%d")
+    radar = options.radar
+
+    # Concatenate the url pieces elementwise across all dates at once
+    if options.level == "1":
+        base_url += f"/{radar}/"
+        urls = base_url + years + f"/vol/{radar}_" + dates + ".pvol.zip"
+    elif options.level == "1b":
+        base_url += f"/level_1b/{radar}/grid/"
+        urls = base_url + years + f"/{radar}_" + dates + "_grid.zip"
 
     return sorted(urls)
 
@@ -224,7 +224,8 @@ def setup_operational(data_options, grid_options, url, directory):
     url : str
         The URL where the radar data can be found.
     directory : str
-        Where to extract the zip file and save the netCDF.
+        Output directory for converted level 1 data. Level 1 volumes are read straight
+        from the zip file, and level 1b zip files are extracted beside the zip file.
 
     Returns
     -------
@@ -233,20 +234,97 @@ def setup_operational(data_options, grid_options, url, directory):
     """
 
     if "http" in urlparse(url).scheme:
-        filepath = _utils.download_file(url, directory)
+        args = [url, data_options.parent_remote, data_options.parent_local]
+        filepath = _utils.download(*args)
     else:
         filepath = url
-    extracted_filepaths = _utils.unzip_file(filepath)[0]
+    # Grid the volumes of this single archive in parallel. Each worker holds a volume
+    # and its grid in memory, so use a bounded number of workers. Note convert_odim
+    # grids sequentially instead when called from a daemonic process.
+    args = [data_options, grid_options, filepath, directory]
+    max_workers = min(4, os.cpu_count() or 1)
+    return setup_operational_file(*args, max_workers=max_workers)
+
+
+def setup_operational_file(
+    data_options, grid_options, filepath, directory, max_workers=1
+):
+    """
+    Unzip and convert a local operational radar zip file. For level 1 data, the ODIM
+    volumes are gridded using max_workers processes; None uses all available cores.
+    """
     if data_options.level == "1":
-        args = [extracted_filepaths, data_options, grid_options]
-        dataset = convert_odim(*args, out_dir=directory)
+        # Read the ODIM volumes straight from the archive rather than extracting them
+        members = _utils.read_zip_members(filepath)
+        args = [members, data_options, grid_options]
+        kwargs = {"out_dir": directory, "out_filename": Path(filepath).stem}
+        kwargs.update({"max_workers": max_workers})
+        dataset = convert_odim(*args, **kwargs)
     elif data_options.level == "1b":
+        extracted_filepaths = _utils.unzip_file(filepath)[0]
         kwargs = {"fields": data_options.fields, "concat_dim": "time"}
         dataset = _utils.consolidate_netcdf(extracted_filepaths, **kwargs)
 
     return dataset
 
 
+def setup_operational_batch(data_options, grid_options, urls, directory, max_workers=4):
+    """
+    Setup operational radar data for many dates. Remote files are downloaded
+    concurrently in threads, and the CPU bound unzipping and conversion is performed
+    in separate processes, so conversion of early dates overlaps with the remaining
+    downloads.
+
+    Parameters
+    ----------
+    urls : list
+        The URLs or local filepaths of the radar zip files.
+    directory : str
+        Output directory for converted level 1 data, as in setup_operational.
+    max_workers : int, optional
+        Maximum number of concurrent downloads and conversion processes.
+
+    Returns
+    -------
+    datasets : list
+        The processed radar data, in the same order as urls.
+    """
+
+    is_remote = ["http" in urlparse(url).scheme for url in urls]
+    remote = [i for i in range(len(urls)) if is_remote[i]]
+    filepaths = list(urls)
+    datasets = [None] * len(urls)
+    args = [data_options, grid_options]
+    if _utils.process_pool_workers(max_workers) == 1:
+        # Convert in a single thread, e.g. in daemonic processes, which cannot start
+        # child processes. Conversion still overlaps with the downloads.
+        converter = ThreadPoolExecutor(max_workers=1)
+    else:
+        converter = ProcessPoolExecutor(max_workers=max_workers)
+    with converter:
+        futures = {}
+        for i in [i for i in range(len(urls)) if not is_remote[i]]:
+            future = converter.submit(setup_operational_file, *args, urls[i], directory)
+            futures[future] = i
+        download_args = [data_options.parent_remote, data_options.parent_local]
+        remote_urls = [urls[i] for i in remote]
+        downloads = _utils.download_many(remote_urls, *download_args, max_workers)
+        # Start converting each file as soon as its download finishes
+        for j, filepath in downloads:
+            i = remote[j]
+            filepaths[i] = filepath
+            future = converter.submit(
+                setup_operational_file, *args, filepath, directory
+            )
+            futures[future] = i
+        for future in as_completed(futures):
+            i = futures[future]
+            datasets[i] = future.result()
+            logger.info("Finished setting up %s.", filepaths[i])
+
+    return datasets
+
+
 # Note "get" functions both retrieve and convert the dataset, and update the
 # input_record boundary data.
 def update_cpol_boundary_data(dataset, input_record, boundary_coords):
@@ -261,9 +339,11 @@ def update_cpol_boundary_data(dataset, input_record, boundary_coords):
         input_record.next_boundary_coordinates = boundary_coords
         input_record.next_boundary_mask = dataset["boundary_mask"]
     else:
-        domain_mask = copy.deepcopy(input_record.next_domain_mask)
-        boundary_mask = copy.deepcopy(input_record.next_boundary_mask)
-        boundary_coords = copy.deepcopy(input_record.next_boundary_coordinates)
+        # The next boundary data are replaced rather than modified in place, so can be
+        # appended to the record without copying
+        domain_mask = input_record.next_domain_mask
+        boundary_mask = input_record.next_boundary_mask
+        boundary_coords = input_record.next_boundary_coordinates
         input_record.domain_masks.append(domain_mask)
         input_record.boundary_coodinates.append(boundary_coords)
         input_record.boundary_masks.append(boundary_mask)
@@ -274,28 +354,89 @@ def update_cpol_boundary_data(dataset, input_record, boundary_coords):
         # objects being detected, and the required threshold on number of observations.
 
 
+# HDF5 chunk cache settings for reading CPOL files. The default 1 MB cache is smaller
+# than the combined chunks of the fields and point coordinates read from each file.
+_cache_kwargs = {"rdcc_nbytes": 64 * 1024**2, "rdcc_nslots": 100003, "rdcc_w0": 0.75}
+
+
+def open_cpol(filepath):
+    """Open a CPOL file with an enlarged HDF5 chunk cache."""
+    try:
+        file = h5netcdf.File(filepath, "r", **_cache_kwargs)
+    except OSError:
+        # Not an HDF5 based netcdf file, so open with the default backend
+        return xr.open_dataset(filepath)
+    return xr.open_dataset(xr.backends.H5NetCDFStore(file))
+
+
+# Only the lowest level of the point latitudes and longitudes, and a single column of
+# the point altitudes, are needed
+_point_indexers = {
+    "point_latitude": {"z": 0},
+    "point_longitude": {"z": 0},
+    "point_altitude": {"y": 0, "x": 0},
+}
+
+
+def read_cpol(filepath, fields):
+    """Read the required variables of a CPOL file into memory."""
+    # Read only the required variables into memory in a single pass, closing the file
+    # rather than leaving it open for lazy reads during regridding and interpolation
+    with open_cpol(filepath) as cpol:
+        cpol = cpol[fields + list(_point_indexers)]
+        # Slice the point coordinates before loading, so the full 3D coordinate arrays
+        # are never read from disk
+        for name, indexers in _point_indexers.items():
+            cpol[name] = cpol[name].variable.isel(indexers)
+        return cpol.load()
+
+
+def get_cpol(filepath, dataset_options):
+    """
+    Get the required variables of a CPOL file, then start reading the next file in the
+    background, so reading files overlaps with regridding and tracking.
+    """
+    args = [filepath, dataset_options.filepaths, read_cpol]
+    return _utils.read_prefetched(*args, list(dataset_options.fields))
+
+
+def standardize_cpol(cpol):
+    """
+    Rename the CPOL point coordinates, and make altitude the vertical dimension. The
+    new dataset is assembled directly from the underlying variables, rather than by a
+    chain of rename, swap_dims, drop_vars and isel calls, which each create a new
+    dataset.
+    """
+    new_names = {"point_latitude": "latitude", "point_longitude": "longitude"}
+    new_names.update({"point_altitude": "altitude"})
+    data_vars, coords = {}, {}
+    for name, variable in cpol.variables.items():
+        if name == "z":
+            continue
+        if name in _point_indexers:
+            # The point coordinates may already have been sliced by read_cpol
+            indexers = _point_indexers[name]
+            variable = variable.isel(indexers, missing_dims="ignore")
+        dims = tuple("altitude" if dim == "z" else dim for dim in variable.dims)
+        variable = xr.Variable(dims, variable.data, variable.attrs, variable.encoding)
+        new_name = new_names.get(name, name)
+        if name in cpol.coords or new_name == "altitude":
+            coords[new_name] = variable
+        else:
+            data_vars[new_name] = variable
+    return xr.Dataset(data_vars, coords=coords, attrs=cpol.attrs)
+
+
 def convert_cpol(time, filepath, track_options, dataset_options, grid_options):
     """Convert CPOL data to a standard format. Retrieve the boundary data."""
 
     time_str = utils.format_time(time, filename_safe=False)
     logger.info(f"Updating {dataset_options.name} dataset for {time_str}.")
 
-    cpol = xr.open_dataset(filepath)
-
+    cpol = get_cpol(filepath, dataset_options)
     if time not in cpol.time.values:
         raise ValueError(f"{time} not in {filepath}")
-
-    point_coords = ["point_latitude", "point_longitude", "point_altitude"]
-    cpol = cpol[dataset_options.fields + point_coords]
-    new_names = {"point_latitude": "latitude", "point_longitude": "longitude"}
-    new_names.update({"point_altitude": "altitude"})
-    cpol = cpol.rename(new_names)
-    cpol["altitude"] = cpol["altitude"].isel(x=0, y=0)
-    cpol = cpol.swap_dims({"z": "altitude"})
-    cpol = cpol.drop_vars("z")
-
-    for var in ["latitude", "longitude"]:
-        cpol[var] = cpol[var].isel(altitude=0)
+    cpol = standardize_cpol(cpol)
 
     if grid_options.name == "geographic":
         dims = ["latitude", "longitude"]
@@ -353,8 +494,8 @@ def convert_cpol(time, filepath, track_options, dataset_options, grid_options):
 
     elif grid_options.name == "cartesian":
         dims = ["y", "x"]
-        # Interpolate vertically
-        ds = cpol.interp(altitude=grid_options.altitude, method="linear")
+        # Vertical interpolation is performed below for both grid types
+        ds = cpol
 
     # THUNER convention uses longitude in the range [0, 360]
     ds["longitude"] = ds["longitude"] % 360
@@ -367,7 +508,7 @@ def convert_cpol(time, filepath, track_options, dataset_options, grid_options):
     if grid_options.altitude is None:
         grid_options.altitude = ds["altitude"].values
     else:
-        ds = ds.interp(altitude=grid_options.altitude, method="linear")
+        ds = _utils.interp_altitude(ds, grid_options.altitude)
 
     # Get the domain mask and domain boundary. Note this is the region where data
     # exists, not the detected object masks from the detect module.
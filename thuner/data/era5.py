@@ -1,9 +1,13 @@
 """Process ERA5 data."""
 
 import calendar
-import signal
+import os
+import shutil
+from functools import lru_cache
+import threading
+from time import monotonic
+from collections import deque
 from pathlib import Path
-import tempfile
 import numpy as np
 import pandas as pd
 import xarray as xr
@@ -13,7 +17,6 @@ from pydantic import Field, model_validator
 import thuner.log as log
 from thuner.utils import get_hour_interval, BaseDatasetOptions
 import thuner.data._utils as _utils
-from thuner.config import get_outputs_directory
 
 __all__ = ["ERA5Options", "get_era5_filepaths"]
 
@@ -28,6 +31,23 @@ _summary = {
 }
 
 
+# Start of the record, parsed once rather than on every validation
+_era5_record_start = np.datetime64("1940-03-01T00:00:00")
+
+# Zero padded day of month strings, sliced to the length of each month
+_day_strings = [f"{i:02}" for i in range(1, 32)]
+# Zero padded hours of the day, requested for every file
+_hour_strings = [f"{i:02}" for i in range(0, 24)]
+# Short data format names used in ERA5 file names
+_short_data_format = {"pressure-levels": "pl", "single-levels": "sfc"}
+
+
+@lru_cache(maxsize=None)
+def _month_last_day(year, month):
+    """Get the last day of the month, cached as it repeats for each field."""
+    return calendar.monthrange(year, month)[1]
+
+
 class ERA5Options(BaseDatasetOptions):
     """Options for ERA5 datasets."""
 
@@ -53,7 +73,8 @@ class ERA5Options(BaseDatasetOptions):
     data_format: _FormatChoices = Field("pressure-levels", description=_desc)
     _desc = "Pressure levels; required if data_format is pressure-levels."
     pressure_levels: list[str] | list[float] | None = Field(None, description=_desc)
-    storage: str = Field("monthly", description=_summary["storage"])
+    _StorageChoices = Literal["daily", "monthly"]
+    storage: _StorageChoices = Field("monthly", description=_summary["storage"])
 
     def get_filepaths(self):
         """Override the get_filepaths method with the era5 version."""
@@ -65,9 +86,11 @@ class ERA5Options(BaseDatasetOptions):
 
     @model_validator(mode="after")
     def _check_ranges(cls, values):
-        if values.latitude_range[0] < -90 or values.latitude_range[1] > 90:
+        min_lat, max_lat = values.latitude_range[0], values.latitude_range[1]
+        if min_lat < -90 or max_lat > 90:
             raise ValueError("Latitude range must be between -90 and 90.")
-        if values.longitude_range[0] < -180 or values.longitude_range[1] > 180:
+        min_lon, max_lon = values.longitude_range[0], values.longitude_range[1]
+        if min_lon < -180 or max_lon > 180:
             raise ValueError("Longitude range must be between -180 and 180.")
         return values
 
@@ -82,7 +105,7 @@ class ERA5Options(BaseDatasetOptions):
 
     @model_validator(mode="after")
     def _check_times(cls, values):
-        start_time = np.datetime64("1940-03-01T00:00:00")
+        start_time = _era5_record_start
         if np.datetime64(values.start) < start_time:
             raise ValueError(f"start must be {str(start_time)} or later.")
         return values
@@ -132,78 +155,67 @@ def get_era5_filepaths(dataset_options: ERA5Options, start=None, end=None):
     start = pd.Timestamp(start)
     end = pd.Timestamp(end)
 
-    short_data_format = {"pressure-levels": "pl", "single-levels": "sfc"}
-
     # Get the times corresponding to the filepaths
     times = get_file_datetimes(dataset_options, start, end)
 
-    # We will store individual fields in separate files
-    fields = dataset_options.fields
-    filepaths = dict(zip(fields, [[] for i in range(len(fields))]))
+    # Get the date components once for all times, rather than creating a Timestamp
+    # for each time and field
+    dates = get_file_dates(times)
+    storage = dataset_options.storage
+    daterange_strs = [_format_daterange(storage, *date) for date in dates]
+    short_format = _short_data_format[dataset_options.data_format]
 
+    # We will store individual fields in separate files. The times are ascending, so
+    # the filepaths of each field are constructed in sorted order.
+    filepaths = {}
     for field in dataset_options.fields:
-        for time in times:
-            time = pd.Timestamp(time)
-            daterange_str = format_daterange(dataset_options, time)
-            filepath = f"{base_path}/{field}/{time.year}/{field}_era5_oper_"
-            filepath += f"{short_data_format[dataset_options.data_format]}_"
-            filepath += f"{daterange_str}.nc"
-            filepaths[field].append(filepath)
-
-    for key in filepaths.keys():
-        filepaths[key] = sorted(filepaths[key])
+        filepaths[field] = [
+            f"{base_path}/{field}/{date[0]}/{field}_era5_oper_{short_format}_{d}.nc"
+            for date, d in zip(dates, daterange_strs)
+        ]
 
     return filepaths
 
 
-def format_daterange(options, time):
-    """
-    Format the date range string used in ERA5 file names on NCI Gadi,
-    https://dx.doi.org/10.25914/5f48874388857.
-
-    Parameters
-    ----------
-    options : dict
-        Dictionary containing the data options.
-    time : np.datetime64, pd.Timestamp or str
-        The time to format.
-
-    Returns
-    -------
-    date_range_str : str
-        The formatted date range str.
-    """
-
-    time = pd.Timestamp(time)
-    last_day = calendar.monthrange(time.year, time.month)[1]
-    if options.storage == "daily":
-        date_range_str = f"{time.year:04}{time.month:02}{time.day:02}"
-    elif options.storage == "monthly":
-        date_range_str = (
-            f"{time.year:04}{time.month:02}01-{time.year:04}{time.month:02}{last_day}"
-        )
+@lru_cache(maxsize=None)
+def _format_daterange(storage, year, month, day):
+    """Format the date range string, cached as it repeats for each field."""
+    if storage == "daily":
+        date_range_str = f"{year:04}{month:02}{day:02}"
+    elif storage == "monthly":
+        last_day = _month_last_day(year, month)
+        date_range_str = f"{year:04}{month:02}01-{year:04}{month:02}{last_day}"
     return date_range_str
 
 
 def get_base_path(options: Any, local: bool = True):
-    """Get the base path for the ERA5 data."""
+    """
+    Get the base path for the ERA5 data. Base paths are requested for every tracking
+    step, so are cached on the options they depend on.
+    """
     if local:
         parent = options.parent_local
     else:
         parent = options.parent_remote
-
-    latitude_range = options.latitude_range
-    longitude_range = options.longitude_range
-    if latitude_range == [-90, 90] and longitude_range == [-180, 180]:
-        return f"{parent}/era5/{options.data_format}/{options.mode}"
-    area = get_area(options)
+    ranges = [options.latitude_range, options.longitude_range]
+    ranges = [None if r is None else tuple(r) for r in ranges]
+    args = [parent, options.data_format, options.mode, options.storage, *ranges]
+    return _get_base_path(*args)
+
+
+@lru_cache(maxsize=None)
+def _get_base_path(parent, data_format, mode, storage, latitude_range, longitude_range):
+    """Get the base path for the ERA5 data, cached on the options it depends on."""
+    if latitude_range == (-90, 90) and longitude_range == (-180, 180):
+        return f"{parent}/era5/{data_format}/{mode}"
+    area = round_area(latitude_range, longitude_range)
     area_str = get_area_string(area)
 
     if area_str is None:
-        group = f"era5_{options.storage}"
+        group = f"era5_{storage}"
     else:
-        group = f"era5_{options.storage}_{area_str}"
-    return f"{parent}/{group}/era5/{options.data_format}/{options.mode}"
+        group = f"era5_{storage}_{area_str}"
+    return f"{parent}/{group}/era5/{data_format}/{mode}"
 
 
 def get_file_datetimes(options, start, end):
@@ -224,6 +236,13 @@ def get_file_datetimes(options, start, end):
     return times
 
 
+def get_file_dates(times):
+    """Get (year, month, day) integer tuples for the given file datetimes."""
+    index = pd.DatetimeIndex(times)
+    years, months = index.year.tolist(), index.month.tolist()
+    return list(zip(years, months, index.day.tolist()))
+
+
 def generate_cdsapi_requests(options):
     """
     Retrieve ERA5 data using the CDS API.
@@ -237,26 +256,26 @@ def generate_cdsapi_requests(options):
     -------
     cds_name : str
         The name argument for the cdsapi retrieval.
-    requests : dict
-        A dictionary containing the cdsapi retrieval options.
-    local_paths : dict
-        A dictionary containing the local file paths.
+    requests : list
+        The cdsapi retrieval options, one request for all fields per file time.
+    download_paths : list
+        The local paths the combined files of each request are downloaded to.
+    local_paths : list
+        Dictionaries mapping each field to its local file path, for each request.
     """
 
     # First get the base_path for where to store the files locally
     base_path = get_base_path(options, local=True)
 
-    short_data_format = {"pressure-levels": "pl", "single-levels": "sfc"}
-    short_format = short_data_format[options.data_format]
+    short_format = _short_data_format[options.data_format]
 
-    requests = dict(zip(options.fields, [[] for i in range(len(options.fields))]))
-    local_paths = dict(zip(options.fields, [[] for i in range(len(options.fields))]))
+    requests, download_paths, local_paths = [], [], []
 
     cds_name = f"reanalysis-era5-{options.data_format}"
 
-    start = pd.Timestamp(options["start"])
+    start = pd.Timestamp(options.start)
     # Add an hour to the end time to facilitate temporal interpolation
-    end = pd.Timestamp(options["end"]) + pd.Timedelta(hours=1)
+    end = pd.Timestamp(options.end) + pd.Timedelta(hours=1)
 
     # Get the times corresponding to the filepaths
     times = get_file_datetimes(options, start, end)
@@ -271,57 +290,65 @@ def generate_cdsapi_requests(options):
     area = [latitude_range[1], longitude_range[0]]
     area += [latitude_range[0], longitude_range[1]]
 
-    # Define a function to get the days for the API request for each time
-    def get_days(time, options):
-        if options.storage == "daily":
-            days = [f"{time.day:02}"]
-        elif options.storage == "monthly":
-            last_day = calendar.monthrange(time.year, time.month)[1]
-            days = [f"{i:02}" for i in range(1, last_day + 1)]
-        else:
-            raise ValueError("options.storage must be either 'daily' or 'monthly'.")
-        return days
-
-    for field in options.fields:
-        for time in times:
-            time = pd.Timestamp(time)
-            days = get_days(time, options)
-
-            request = {
-                "product_type": [options.mode],
-                "data_format": "netcdf",
-                "download_format": "unarchived",
-                "variable": [field],
-                "pressure_level": options["pressure_levels"],
-                "year": [f"{time.year:04}"],
-                "month": [f"{time.month:02}"],
-                "day": days,
-                "time": [f"{i:02}" for i in range(0, 24)],
-                "area": area,
-            }
-            daterange_str = format_daterange(options, time)
-            local_path = f"{base_path}/{field}/{time.year}/{field}_era5_oper_"
-            local_path += f"{short_format}_{daterange_str}.nc"
-            requests[field].append(request)
-            local_paths[field].append(local_path)
-
-    return cds_name, requests, local_paths
-
-
-def get_area(options):
-    """Get the area for the CDS API request."""
-    if options.longitude_range is None:
+    # The parts of the request common to all times. All fields are requested together
+    # to avoid queueing a separate CDS job for each field.
+    base_request = {
+        "product_type": [options.mode],
+        "variable": list(options.fields),
+        "data_format": "netcdf",
+        "download_format": "unarchived",
+        "pressure_level": options.pressure_levels,
+        "time": _hour_strings,
+        "area": area,
+    }
+
+    # Get the date components once for all times
+    dates = get_file_dates(times)
+    for year, month, day in dates:
+        request = base_request.copy()
+        request.update({"year": [f"{year:04}"], "month": [f"{month:02}"]})
+        request.update({"day": get_days(options.storage, year, month, day)})
+        daterange_str = _format_daterange(options.storage, year, month, day)
+        filename = f"era5_oper_{short_format}_{daterange_str}.nc"
+        # Fields are split from the combined download into their usual locations
+        field_paths = {}
+        for field in options.fields:
+            field_paths[field] = f"{base_path}/{field}/{year}/{field}_{filename}"
+        requests.append(request)
+        download_paths.append(f"{base_path}/all/{year}/{filename}")
+        local_paths.append(field_paths)
+
+    return cds_name, requests, download_paths, local_paths
+
+
+def get_days(storage, year, month, day):
+    """Get the day strings for the cdsapi request for a file, from the static table."""
+    if storage == "daily":
+        days = _day_strings[day - 1 : day]
+    elif storage == "monthly":
+        days = _day_strings[: _month_last_day(year, month)]
+    else:
+        raise ValueError("options.storage must be either 'daily' or 'monthly'.")
+    return days
+
+
+def round_area(latitude_range, longitude_range):
+    """
+    Round the latitude and longitude ranges outwards to the integer area for the CDS
+    API request, or None if the ranges cover the globe.
+    """
+    if longitude_range is None:
         max_lon = 180
         min_lon = -180
         logger.warning("No longitude range provided. ERA5 files cover all longitudes.")
     else:
-        [min_lon, max_lon] = options.longitude_range
-    if options.latitude_range is None:
+        [min_lon, max_lon] = longitude_range
+    if latitude_range is None:
         max_lat = 90
         min_lat = -90
         logger.warning("No latitude range provided. ERA5 files cover all latitudes.")
     else:
-        [min_lat, max_lat] = options.latitude_range
+        [min_lat, max_lat] = latitude_range
     [max_lat, max_lon] = [int(np.ceil(coord)) for coord in [max_lat, max_lon]]
     [min_lat, min_lon] = [int(np.floor(coord)) for coord in [min_lat, min_lon]]
     if min_lon == -180 and max_lon == 180 and min_lat == -90 and max_lat == 90:
@@ -330,57 +357,129 @@ def get_area(options):
         return [max_lat, min_lon, min_lat, max_lon]
 
 
+# Convert a signed latitude or longitude to a string, e.g. 150E
+def _format_lat(lat):
+    return "0" if lat == 0 else f"{int(abs(lat))}{'N' if lat > 0 else 'S'}"
+
+
+def _format_lon(lon):
+    return "0" if lon == 0 else f"{int(abs(lon))}{'E' if lon > 0 else 'W'}"
+
+
 def get_area_string(area):
     """Get the area string for the CDS API request."""
     if area is None:
         return None
+    return _get_area_string(tuple(area))
 
-    # Convert a signed latitude or longitude to a string, e.g. 150E
-    def format_lat(lat):
-        return "0" if lat == 0 else f"{int(abs(lat))}{'N' if lat > 0 else 'S'}"
 
-    def format_lon(lon):
-        return "0" if lon == 0 else f"{int(abs(lon))}{'E' if lon > 0 else 'W'}"
-
-    area_string = f"{format_lat(area[0])}_{format_lon(area[1])}_{format_lat(area[2])}_{format_lon(area[3])}"
+@lru_cache(maxsize=None)
+def _get_area_string(area):
+    """Get the area string for the CDS API request, cached on the area tuple."""
+    area_string = f"{_format_lat(area[0])}_{_format_lon(area[1])}_"
+    area_string += f"{_format_lat(area[2])}_{_format_lon(area[3])}"
     return area_string
 
 
+def split_fields(download_path, field_paths):
+    """Split a downloaded file containing multiple fields into a file per field."""
+    with xr.open_dataset(download_path) as ds:
+        for field, local_path in field_paths.items():
+            Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+            ds[[field]].to_netcdf(local_path)
+    Path(download_path).unlink()
+
+
 def issue_cdsapi_requests(
-    cds_name, requests, local_paths, enforce_timeout=False, timeout=5
+    cds_name,
+    requests,
+    download_paths,
+    local_paths,
+    enforce_timeout=False,
+    timeout=5,
+    max_workers=8,
 ):
-    """Issue cdsapi requests. Note the wait client functionality doesn't appear to work
-    yet."""
+    """
+    Issue cdsapi requests. Requests spend most of their time waiting in the CDS queue,
+    so are issued concurrently from a pool of daemon threads, each with its own client.
+    Each request covers all fields, which are split into a file per field once
+    downloaded. If enforce_timeout is True, stop waiting for requests that have not
+    completed within timeout seconds of being started. Requests already submitted
+    keep running on the CDS side, and their threads are abandoned rather than joined,
+    so they do not block interpreter exit. Requests that cannot start because every
+    thread is held by a timed out request are skipped. Note the wait client
+    functionality doesn't appear to work yet.
+    """
 
-    def download_data(cds_name, request, local_path):
+    def download_data(cds_name, request, download_path, field_paths):
         c = cdsapi.Client(sleep_max=5, retry_max=1)
-        response = c.retrieve(cds_name, request, local_path)
+        response = c.retrieve(cds_name, request, download_path)
+        split_fields(download_path, field_paths)
         return response
 
-    def handle_request(cds_name, request, local_path):
-        path = Path(local_path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        if enforce_timeout:
-
-            def signal_handler(signum, frame):
-                raise TimeoutError("Request timed out.")
-
-            signal.signal(signal.SIGALRM, signal_handler)
-            signal.alarm(timeout)
+    for download_path in download_paths:
+        Path(download_path).parent.mkdir(parents=True, exist_ok=True)
+    jobs = [(cds_name, *job) for job in zip(requests, download_paths, local_paths)]
+    if len(jobs) == 0:
+        return
+
+    # Shared state is guarded by the condition, which workers notify as jobs start
+    # and finish
+    condition = threading.Condition()
+    pending = deque(enumerate(jobs))
+    start_times, finished, errors = {}, set(), {}
+
+    def worker():
+        while True:
+            with condition:
+                if len(pending) == 0:
+                    return
+                i, job = pending.popleft()
+                start_times[i] = monotonic()
+                condition.notify_all()
             try:
-                download_data(cds_name, request, local_path)
-            except TimeoutError:
-                filename = Path(local_path).name
-                message = f"Request for {filename} timed out after {timeout} seconds."
-                logger.warning(message)
+                download_data(*job)
+            except Exception as exception:
+                errors[i] = exception
             finally:
-                signal.alarm(0)
-        else:
-            download_data(cds_name, request, local_path)
-
-    for field in requests.keys():
-        for i in range(len(local_paths[field])):
-            handle_request(cds_name, requests[field][i], local_paths[field][i])
+                with condition:
+                    finished.add(i)
+                    condition.notify_all()
+
+    num_workers = min(max_workers, len(jobs))
+    for _ in range(num_workers):
+        threading.Thread(target=worker, daemon=True).start()
+
+    def warn(i, message):
+        logger.warning("Request for %s %s", Path(jobs[i][2]).name, message)
+
+    unresolved, timed_out = set(range(len(jobs))), set()
+    with condition:
+        while True:
+            now = monotonic()
+            for i in sorted(unresolved):
+                if i in finished:
+                    unresolved.discard(i)
+                    if i in errors:
+                        raise errors[i]
+                elif enforce_timeout and i in start_times:
+                    if now - start_times[i] >= timeout:
+                        unresolved.discard(i)
+                        timed_out.add(i)
+                        warn(i, f"timed out after {timeout} seconds.")
+            # Threads held by timed out requests will not start the remaining requests
+            if len(timed_out - finished) >= num_workers:
+                for i, _ in pending:
+                    unresolved.discard(i)
+                    warn(i, "not started; all threads held by timed out requests.")
+                pending.clear()
+            if len(unresolved) == 0:
+                return
+            wait = None
+            started = [start_times[i] for i in unresolved if i in start_times]
+            if enforce_timeout and len(started) > 0:
+                wait = max(0, min(started) + timeout - now)
+            condition.wait(wait)
 
 
 def convert_era5(ds):
@@ -415,8 +514,8 @@ def update_era5_input_record(
     )
     if not all_files_exist and dataset_options.attempt_download:
         logger.warning("One or more filepaths do not exist; attempting download.")
-        cds_name, requests, local_paths = generate_cdsapi_requests(dataset_options)
-        issue_cdsapi_requests(cds_name, requests, local_paths)
+        args = generate_cdsapi_requests(dataset_options)
+        issue_cdsapi_requests(*args)
 
     lat = np.array(grid_options.latitude)
     lon = np.array(grid_options.longitude)
@@ -424,18 +523,199 @@ def update_era5_input_record(
     lat_range = (lat.min() - 0.25, lat.max() + 0.25)
     lon_range = (lon.min() - 0.25, lon.max() + 0.25)
 
-    # Assume user has write privileges in the base_local directory
     logger.info(f"Subsetting {dataset_options.name} data.")
-    with tempfile.TemporaryDirectory(dir=str(get_outputs_directory())) as tmp:
-        for field in dataset_options.fields:
-            for filepath in filepaths[field]:
-                output_filename = Path(filepath).name
-                logger.debug("Subsetting %s", output_filename)
-                args = [filepath, f"{tmp}/{output_filename}.nc", start, end]
-                args += [lat_range, lon_range]
-                _utils.call_ncks(*args)
-        logger.debug("Merging files.")
-        ds = xr.open_mfdataset(f"{tmp}/*.nc")
-        logger.debug("Converting")
-        ds = convert_era5(ds)
-        input_record.dataset = ds.load()
+    conv_options = dataset_options.converted_options
+    use_cache = conv_options.save or conv_options.load
+    datasets = []
+    for field in dataset_options.fields:
+        field_datasets = []
+        for filepath in filepaths[field]:
+            logger.debug("Subsetting %s", Path(filepath).name)
+            args = [filepath, start, end, lat_range, lon_range]
+            if use_cache:
+                field_datasets.append(open_cached_subset(*args, dataset_options))
+            else:
+                field_datasets.append(open_subset(*args))
+        datasets.append(concat_times(field_datasets))
+    logger.debug("Merging files.")
+    # The subsets are already in memory, so combine them explicitly rather than
+    # building a dask graph with open_mfdataset
+    ds = xr.merge(datasets, compat="override", join="override")
+    logger.debug("Converting")
+    input_record.dataset = convert_era5(ds)
+
+
+def open_subset(filepath, start, end, lat_range, lon_range):
+    """
+    Read the subset of an ERA5 file within the given time, latitude and longitude
+    ranges. The file is opened lazily and only the selected hyperslab is loaded, so
+    no subsetted copy need be written to disk. Files are read with h5netcdf where
+    possible, falling back to the default engine for files h5netcdf cannot read.
+    """
+    try:
+        ds = xr.open_dataset(filepath, engine="h5netcdf", chunks=None)
+    except OSError:
+        ds = xr.open_dataset(filepath, chunks=None)
+    with ds:
+        return subset_era5(ds, start, end, lat_range, lon_range).load()
+
+
+def subset_era5(ds, start, end, lat_range, lon_range):
+    """Lazily subset an ERA5 dataset to the given time and latitude/longitude ranges."""
+    time_var = "valid_time" if "valid_time" in ds.dims else "time"
+    subset = ds.sel({time_var: slice(start, end)})
+    return subset.isel(get_range_indexers(ds, lat_range, lon_range))
+
+
+def get_zarr_filepath(filepath, dataset_options, area):
+    """
+    Get the filepath of the zarr store caching the subset of an ERA5 file over the
+    given area, mirroring the raw file's location under the converted parent. Files
+    outside parent_local raise a ValueError, rather than being cached beside the raw
+    files.
+    """
+    parent_converted = dataset_options.converted_options.parent_converted
+    if parent_converted is None:
+        raise ValueError("No parent directory provided.")
+    parent = Path(dataset_options.parent_local)
+    try:
+        relative_filepath = Path(filepath).relative_to(parent)
+    except ValueError:
+        raise ValueError(f"{filepath} is not within parent_local {parent}.")
+    stem = (Path(parent_converted) / relative_filepath).with_suffix("")
+    return f"{stem}_{get_area_string(area)}.zarr"
+
+
+def get_packed_encoding(variable):
+    """
+    Get the encoding packing a float variable into int16, scaled to span the range of
+    the variable. ERA5 fields are themselves distributed as int16 packed over wider
+    ranges, so the precision is comparable to the source data, at half the bytes.
+    """
+    values = variable.values[np.isfinite(variable.values)]
+    vmin, vmax = (float(values.min()), float(values.max())) if values.size else (0, 0)
+    scale = (vmax - vmin) / 65534 if vmax > vmin else 1.0
+    float_type = variable.dtype.type
+    encoding = {"dtype": "int16", "_FillValue": np.int16(-32768)}
+    encoding["scale_factor"] = float_type(scale)
+    encoding["add_offset"] = float_type(vmin + 32767 * scale)
+    return encoding
+
+
+def convert_era5_to_zarr(filepath, zarr_filepath, area, pack=True):
+    """
+    Convert the subset of an ERA5 file over the given area to a zarr store. The store
+    is chunked by day in time and by up to 256 gridpoints in latitude and longitude,
+    with all pressure levels in each chunk, so reading the hours around a given time
+    reads only a few small chunks rather than the whole monthly file. If pack is True,
+    float fields are packed into scaled int16, which xarray decodes on reading.
+    """
+    logger.info("Caching %s as zarr.", Path(filepath).name)
+    lat_range, lon_range = [area[2], area[0]], [area[1], area[3]]
+    try:
+        ds = xr.open_dataset(filepath, engine="h5netcdf", chunks=None)
+    except OSError:
+        ds = xr.open_dataset(filepath, chunks=None)
+    with ds:
+        subset = subset_era5(ds, None, None, lat_range, lon_range).load()
+    time_var = "valid_time" if "valid_time" in subset.dims else "time"
+    chunks = dict(subset.sizes)
+    chunks.update({time_var: min(24, chunks[time_var])})
+    chunks.update({d: min(256, chunks[d]) for d in ["latitude", "longitude"]})
+    encoding = {}
+    for name, variable in subset.data_vars.items():
+        encoding[name] = {"chunks": [chunks[d] for d in variable.dims]}
+        if pack and np.issubdtype(variable.dtype, np.floating):
+            encoding[name].update(get_packed_encoding(variable))
+    # Zarr stores the scale and offset as json floats, which decode to float64, so
+    # record the dtype to restore on reading
+    for name in encoding:
+        if "scale_factor" in encoding[name]:
+            dtype = subset[name].dtype.name
+            subset[name] = subset[name].assign_attrs(unpacked_dtype=dtype)
+    # Write to a temporary store unique to this process first, so an interrupted
+    # conversion is not reused, and processes converting the same file concurrently,
+    # e.g. parallel intervals sharing a monthly file, do not write the same store
+    Path(zarr_filepath).parent.mkdir(parents=True, exist_ok=True)
+    tmp_filepath = f"{zarr_filepath}.{os.getpid()}.tmp"
+    subset.to_zarr(tmp_filepath, mode="w", encoding=encoding)
+    try:
+        Path(tmp_filepath).rename(zarr_filepath)
+    except OSError:
+        if not Path(zarr_filepath).exists():
+            raise
+        # Another process finished the store first, so use theirs
+        logger.debug("%s already cached.", Path(filepath).name)
+        shutil.rmtree(tmp_filepath)
+
+
+def open_cached_subset(filepath, start, end, lat_range, lon_range, dataset_options):
+    """
+    Read the subset of an ERA5 file from its zarr cache, creating the cache if it does
+    not yet exist and converted_options.save is True. The cache covers the integer
+    bounding box of the given ranges, so is reused across the tracking steps of a run.
+    Falls back to reading the raw file if the cache is unavailable.
+    """
+    area = [int(np.ceil(lat_range[1])), int(np.floor(lon_range[0]))]
+    area += [int(np.floor(lat_range[0])), int(np.ceil(lon_range[1]))]
+    zarr_filepath = get_zarr_filepath(filepath, dataset_options, area)
+    if not Path(zarr_filepath).exists():
+        if not dataset_options.converted_options.save:
+            return open_subset(filepath, start, end, lat_range, lon_range)
+        convert_era5_to_zarr(filepath, zarr_filepath, area)
+    with xr.open_zarr(zarr_filepath) as ds:
+        subset = subset_era5(ds, start, end, lat_range, lon_range).load()
+    for name in list(subset.data_vars):
+        dtype = subset[name].attrs.pop("unpacked_dtype", None)
+        if dtype is not None:
+            subset[name] = subset[name].astype(dtype)
+    return subset
+
+
+def get_range_indexers(ds, lat_range, lon_range):
+    """
+    Get the latitude and longitude indexers within the given ranges. Latitudes are
+    descending in ERA5 files, and longitude ranges may cross the antimeridian. Every
+    file of a dataset shares the same grid, so indexers are computed once for each
+    grid and pair of ranges.
+    """
+    latitude = np.asarray(ds["latitude"].values, dtype=float)
+    longitude = np.asarray(ds["longitude"].values, dtype=float)
+    args = [latitude.tobytes(), longitude.tobytes()]
+    args += [float(lat) for lat in lat_range] + [float(lon) for lon in lon_range]
+    return dict(_range_indexers(*args))
+
+
+def _as_slice(indices):
+    """Convert contiguous indices to a slice, which backends read as one hyperslab."""
+    if len(indices) == 0:
+        return slice(0, 0)
+    if np.all(np.diff(indices) == 1):
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    indices.flags.writeable = False
+    return indices
+
+
+@lru_cache(maxsize=None)
+def _range_indexers(latitude, longitude, min_lat, max_lat, min_lon, max_lon):
+    """Get the indexers within the ranges, cached on the coordinate bytes."""
+    latitude, longitude = np.frombuffer(latitude), np.frombuffer(longitude)
+    lat_indices = np.flatnonzero((latitude >= min_lat) & (latitude <= max_lat))
+    # Match the longitude convention of the ERA5 files, i.e. [-180, 180)
+    min_lon, max_lon = [(lon + 180) % 360 - 180 for lon in [min_lon, max_lon]]
+    if min_lon <= max_lon:
+        lon_indices = np.flatnonzero((longitude >= min_lon) & (longitude <= max_lon))
+    else:
+        # Range crosses the antimeridian, so take the eastern part first
+        east = np.flatnonzero(longitude >= min_lon)
+        lon_indices = np.concatenate([east, np.flatnonzero(longitude <= max_lon)])
+    return {"latitude": _as_slice(lat_indices), "longitude": _as_slice(lon_indices)}
+
+
+def concat_times(datasets):
+    """Concatenate the subsets of a single field along the time dimension."""
+    if len(datasets) == 1:
+        return datasets[0]
+    time_dim = "valid_time" if "valid_time" in datasets[0].dims else "time"
+    kwargs = {"dim": time_dim, "coords": "minimal", "compat": "override"}
+    return xr.concat(datasets, **kwargs)
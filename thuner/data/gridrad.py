@@ -29,6 +29,10 @@ __all__ = [
 ]
 
 
+# Start of the record, parsed once rather than on every validation
+_gridrad_record_start = np.datetime64("2010-01-20T18:00:00")
+
+
 class GridRadSevereOptions(utils.BaseDatasetOptions):
     """Options for GridRad Severe datasets."""
 
@@ -63,7 +67,7 @@ class GridRadSevereOptions(utils.BaseDatasetOptions):
     @model_validator(mode="after")
     def _check_times(cls, values):
         """Check start_time isn't before beginning of GridRad record."""
-        start_time = np.datetime64("2010-01-20T18:00:00")
+        start_time = _gridrad_record_start
         if np.datetime64(values.start) < start_time:
             raise ValueError(f"start must be {str(start_time)} or later.")
         return values
@@ -148,8 +152,7 @@ def get_gridrad_filepaths(options):
     base_url = utils.get_parent(options)
     base_url += f"/{dataset_id_converter[options.dataset_id]}/volumes"
 
-    times = np.arange(start, end + np.timedelta64(10, "m"), np.timedelta64(10, "m"))
-    times = pd.DatetimeIndex(times)
+    times = pd.date_range(start, end, freq="10min")
     start, end = pd.Timestamp(start), pd.Timestamp(end)
 
     # Note gridrad severe directories are organized by the day the event "started"
@@ -157,10 +160,9 @@ def get_gridrad_filepaths(options):
         event_start = pd.Timestamp(options.event_start)
         base_filepath = f"{base_url}/{event_start.year}/"
         base_filepath += f"{event_start.year}{event_start.month:02}{event_start.day:02}"
-        for time in times:
-            filepath = f"{base_filepath}/nexrad_3d_{options.version}_"
-            filepath += f"{time.year}{time.month:02}{time.day:02}T"
-            filepath += f"{time.hour:02}{time.minute:02}00Z.nc"
+        stamps = times.strftime("%Y%m%dT%H%M00Z")
+        for stamp in stamps:
+            filepath = f"{base_filepath}/nexrad_3d_{options.version}_{stamp}.nc"
             # Check if the file exists
             if Path(filepath).exists():
                 filepaths.append(filepath)
@@ -183,6 +185,12 @@ def open_gridrad(path, dataset_options):
     return ds
 
 
+def read_gridrad(path, dataset_options):
+    """Open a GridRad file with open_gridrad, then load it into memory and close it."""
+    with open_gridrad(path, dataset_options) as ds:
+        return ds.load()
+
+
 def reshape_variable(ds, variable):
     """
     Reshape a variable in a GridRad dataset to a 3D grid. Adapted from code provided by
@@ -260,8 +268,8 @@ def filter(
     cond_frac = xr.where(obs_cond | frac_cond, True, False, **kwargs)
     # Retain values not filtered
     preserved = xr.where(~cond_refl & ~cond_frac, True, False, **kwargs)
-    for var in variables:
-        ds[var] = ds[var].where(preserved)
+    # Mask all variables with a single dataset level where
+    ds.update(ds[list(variables)].where(preserved))
     return ds
 
 
@@ -281,8 +289,8 @@ def remove_speckles(ds, window_size=5, coverage_thresh=0.32, variables=None):
     refl_exists = xr.where(~np.isnan(ds["Reflectivity"]), True, False)
     min_size = window_size**3 * coverage_thresh
     speckle_mask = remove_small_objects(refl_exists.values > 0, min_size=min_size)
-    for var in variables:
-        ds[var] = ds[var].where(speckle_mask)
+    speckle_mask = refl_exists.copy(data=speckle_mask)
+    ds.update(ds[list(variables)].where(speckle_mask))
     return ds
 
 
@@ -312,8 +320,7 @@ def remove_low_level_clutter(ds, variables=None):
     # Check for weak echos below 2 km
     cond_4 = (refl_15_max_alt < 2.0) & (refl_15_max_alt > 0.0)
     cond = np.logical_not(cond_1 | cond_2 | cond_3 | cond_4)
-    for var in variables:
-        ds[var] = ds[var].where(cond)
+    ds.update(ds[list(variables)].where(cond))
     return ds
 
 
@@ -333,8 +340,7 @@ def remove_clutter_below_anvils(ds, variables=None):
     exists_below_4 = exists.where(ds.Altitude < 4.0, drop=True).sum(dim="Altitude") > 0
 
     cond = exists_4 | ~exists_above_4 | ~exists_below_4
-    for var in variables:
-        ds[var] = ds[var].where(cond)
+    ds.update(ds[list(variables)].where(cond))
     return ds
 
 
@@ -363,8 +369,7 @@ def remove_clutter(ds, variables=None, low_level=True, below_anvil=False):
 
     # Remove low reflectivity low level clutter
     cond = (ds.Reflectivity >= 10.0) | (ds.Altitude > 4.0)
-    for var in variables:
-        ds[var] = ds[var].where(cond)
+    ds.update(ds[list(variables)].where(cond))
 
     # Attempt correlation based clutter removal if relevant variables exist
     correlation_var_list = ["DifferentialReflectivity", "CorrelationCoefficient"]
@@ -376,8 +381,7 @@ def remove_clutter(ds, variables=None, low_level=True, below_anvil=False):
         cond2 = ds["Reflectivity"] >= 25.0 | ds["CorrelationCoefficient"] >= 0.95
         cond2 = cond2 | ds["Altitude"] < 10.0
         # Require both conditions above be met
-        for var in variables:
-            ds[var] = ds[var].where(cond1 & cond2)
+        ds.update(ds[list(variables)].where(cond1 & cond2))
 
     # First pass at speckle removal
     ds = remove_speckles(ds, variables=variables)
@@ -399,7 +403,9 @@ def convert_gridrad(time, filepath, track_options, dataset_options, grid_options
     logger.debug(f"Converting GridRad dataset at time {time}.")
 
     # Open the dataset and perform preliminary filtering and decluttering
-    ds = open_gridrad(filepath, dataset_options)
+    # Read the file, and start reading the next file in the background
+    args = [filepath, dataset_options.filepaths, read_gridrad, dataset_options]
+    ds = _utils.read_prefetched(*args)
     ds = filter(ds, obs_thresh=dataset_options.obs_thresh)
     ds = remove_clutter(ds)
 
@@ -10,7 +10,6 @@ else:
     message += "If you need regridding, consider using a Linux or MacOS system."
     print(message)
 
-import copy
 from urllib.parse import urlparse
 from pathlib import Path
 import xarray as xr
@@ -85,7 +84,7 @@ class HimawariOptions(utils.BaseDatasetOptions):
         """Get Himawari fielpaths."""
         filepaths = get_himawari_filepaths(self)
         # Subset to just those files that actually exist locally
-        filepaths = sorted([fp for fp in filepaths if Path(fp).exists()])
+        filepaths = sorted(_utils.existing_filepaths(filepaths))
         return filepaths
 
     def convert_dataset(self, time, filepath, track_options, grid_options):
@@ -103,7 +102,7 @@ class HimawariOptions(utils.BaseDatasetOptions):
             logger.info("Generating Himawari filepaths.")
             filepaths = get_himawari_filepaths(values)
             # Subset to just those files that actually exist locally
-            filepaths = sorted([fp for fp in filepaths if Path(fp).exists()])
+            filepaths = sorted(_utils.existing_filepaths(filepaths))
             values.filepaths = filepaths
         if values.filepaths is None:
             raise ValueError("filepaths not provided or badly formed.")
@@ -116,15 +115,25 @@ class HimawariOptions(utils.BaseDatasetOptions):
         return values
 
 
+def get_himawari_base_filepath(options: HimawariOptions):
+    """
+    Get the directory containing the Himawari data for the given options.
+    """
+
+    base_filepath = utils.get_parent(options)
+    base_filepath += f"/satellite-products/{options.time_frame}/obs/"
+    base_filepath += f"himawari-{options.instrument.lower()}/{options.region}/"
+    base_filepath += f"{options.version}/"
+    return base_filepath
+
+
 def get_himawari_coordinates_filepath(options: HimawariOptions):
     """
     Get the coordinates filepath for Himawari data.
     """
 
-    filepath = utils.get_parent(options)
-    filepath += f"/satellite-products/{options.time_frame}/obs/"
-    filepath += f"himawari-{options.instrument.lower()}/{options.region}/"
-    filepath += f"{options.version}/ancillary/00000000000000-P1S-ABOM_GEOM_"
+    filepath = get_himawari_base_filepath(options)
+    filepath += "ancillary/00000000000000-P1S-ABOM_GEOM_"
     filepath += f"SENSOR-PRJ_GEOS141_{options.resolution}-HIMAWARI8-AHI.nc"
 
     return filepath
@@ -138,25 +147,15 @@ def get_himawari_filepaths(options: HimawariOptions):
     start = np.datetime64(options.start).astype("datetime64[m]")
     end = np.datetime64(options.end).astype("datetime64[m]")
 
-    filepaths = []
+    base_filepath = get_himawari_base_filepath(options)
 
-    base_filepath = utils.get_parent(options)
-    base_filepath += f"/satellite-products/{options.time_frame}/obs/"
-    base_filepath += f"himawari-{options.instrument.lower()}/{options.region}/"
-    base_filepath += f"{options.version}/"
-
-    times = np.arange(start, end + np.timedelta64(10, "m"), np.timedelta64(10, "m"))
-    times = pd.DatetimeIndex(times)
-    for time in times:
-        satellite = "HIMAWARI8" if time < pd.Timestamp("2022-12-13") else "HIMAWARI9"
-        filepath = (
-            f"{base_filepath}{time.year:04d}/{time.month:02d}/{time.day:02d}/"
-            f"{time.hour:02d}{time.minute:02d}/"
-            f"{time.year:04d}{time.month:02d}{time.day:02d}{time.hour:02d}"
-            f"{time.minute:02d}00-P1S-ABOM_OBS_{options.band}-PRJ_GEOS141_"
-            f"{options.resolution}-{satellite}-{options.instrument}.nc"
-        )
-        filepaths.append(filepath)
+    times = pd.date_range(start, end, freq="10min")
+    # Format all times at once, then concatenate the filepath pieces elementwise
+    stamps = times.strftime("%Y/%m/%d/%H%M/%Y%m%d%H%M00")
+    satellites = np.where(times < pd.Timestamp("2022-12-13"), "HIMAWARI8", "HIMAWARI9")
+    product = f"-P1S-ABOM_OBS_{options.band}-PRJ_GEOS141_{options.resolution}-"
+    filepaths = base_filepath + stamps + product + satellites
+    filepaths = list(filepaths + f"-{options.instrument}.nc")
     return sorted(filepaths)
 
 
@@ -165,10 +164,8 @@ def get_himawari_ancillary_filepaths(options: HimawariOptions):
     Get ancillary filepaths for Himawari data.
     """
     filepaths = []
-    base_filepath = utils.get_parent(options)
-    base_filepath += f"/satellite-products/{options.time_frame}/obs/"
-    base_filepath += f"himawari-{options.instrument.lower()}/{options.region}/"
-    base_filepath += f"{options.version}/ancillary/00000000000000-P1S-ABOM_GEOM_"
+    base_filepath = get_himawari_base_filepath(options)
+    base_filepath += "ancillary/00000000000000-P1S-ABOM_GEOM_"
     for file_type in ["AUSDEM", "LAND", "SENSOR"]:
         for resolution in [500, 1000, 2000]:
             filepath = base_filepath + f"{file_type}-PRJ_GEOS141_{resolution}"
@@ -246,9 +243,11 @@ def update_himawari_boundary_data(dataset, input_record, boundary_coords):
         input_record.next_boundary_coordinates = boundary_coords
         input_record.next_boundary_mask = dataset["boundary_mask"]
     else:
-        domain_mask = copy.deepcopy(input_record.next_domain_mask)
-        boundary_mask = copy.deepcopy(input_record.next_boundary_mask)
-        boundary_coords = copy.deepcopy(input_record.next_boundary_coordinates)
+        # The next boundary data are replaced rather than modified in place, so can be
+        # appended to the record without copying
+        domain_mask = input_record.next_domain_mask
+        boundary_mask = input_record.next_boundary_mask
+        boundary_coords = input_record.next_boundary_coordinates
         input_record.domain_masks.append(domain_mask)
         input_record.boundary_coodinates.append(boundary_coords)
         input_record.boundary_masks.append(boundary_mask)
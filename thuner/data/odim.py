@@ -1,6 +1,8 @@
 """Process ODIM data."""
 
 import os
+import io
+from concurrent.futures import ProcessPoolExecutor
 
 # Set the environment variable to turn off the pyart welcome message
 os.environ["PYART_QUIET"] = "True"
@@ -10,20 +12,58 @@ import thuner.data._utils as _utils
 from pathlib import Path
 import xarray as xr
 
-
 logger = setup_logger(__name__)
 
 
+def convert_odim_volume(filepath, data_options, grid_shape, grid_limits):
+    """
+    Grid a single ODIM volume with pyart, returning None if the conversion fails.
+    filepath is either a filepath, or a (name, bytes) pair for a file in memory.
+    """
+    if isinstance(filepath, str):
+        file = filepath
+    else:
+        # In memory files are read by h5py through a file-like object
+        filepath, contents = filepath
+        file = io.BytesIO(contents)
+    try:
+        logger.debug(f"Converting {filepath} to pyart.")
+        dataset = pyart.aux_io.read_odim_h5(
+            file, file_field_names=False, include_fields=data_options.fields
+        )
+        logger.debug(f"Gridding {filepath}.")
+        dataset = pyart.map.grid_from_radars(
+            dataset,
+            grid_shape=grid_shape,
+            grid_limits=grid_limits,
+            weighting_function=data_options.weighting_function,
+        )
+        logger.debug(f"Converting {filepath} to xarray.")
+        return dataset.to_xarray()
+    except Exception as e:
+        logger.warning(f"Failed to convert {filepath}. {e}")
+        return None
+
+
 def convert_odim(
-    filepaths, data_options, grid_options, out_dir=None, out_filename=None, save=False
+    filepaths,
+    data_options,
+    grid_options,
+    out_dir=None,
+    out_filename=None,
+    save=False,
+    max_workers=1,
 ):
     """
     Convert ODIM files to xarray datasets, and save as netCDF if required.
 
     Parameters
     ----------
-    filenames : list
-        List of related filenames to be converted, e.g. all the files from a single day.
+    filepaths : list
+        List of related filepaths to be converted, e.g. all the files from a single day.
+        Alternatively an iterable of (name, bytes) pairs of files already read into
+        memory, e.g. from _utils.read_zip_members, in which case out_dir and
+        out_filename must be provided if saving.
     data_options : dict
         Dictionary containing the data options.
     grid_options : dict
@@ -36,6 +76,10 @@ def convert_odim(
         If True, the converted files will be saved as netCDF files in the specified directory.
         If False, the converted files will only be returned as xarray datasets without saving.
         Default is False.
+    max_workers : int, optional
+        Number of processes to grid the volumes with. If None, use all available
+        cores. Default is 1, i.e. grid the volumes sequentially in this process, which
+        is also done in daemonic processes, as they cannot start child processes.
 
     Returns
     -------
@@ -43,33 +87,28 @@ def convert_odim(
         The THUNER compliant xarray dataset containing the converted ODIM files.
     """
 
-    if out_dir is None:
-        out_dir = Path(filepaths[0]).parent
-    if out_filename is None:
-        out_filename = Path(filepaths[0]).parent.name
+    if isinstance(filepaths, (list, tuple)):
+        filepaths = sorted(filepaths)
+        if len(filepaths) > 0 and isinstance(filepaths[0], str):
+            if out_dir is None:
+                out_dir = Path(filepaths[0]).parent
+            if out_filename is None:
+                out_filename = Path(filepaths[0]).parent.name
 
     grid_shape = _utils.get_pyart_grid_shape(grid_options)
     grid_limits = _utils.get_pyart_grid_limits(grid_options)
 
-    datasets = []
-    for filepath in sorted(filepaths):
-        try:
-            logger.debug(f"Converting {filepath} to pyart.")
-            dataset = pyart.aux_io.read_odim_h5(
-                filepath, file_field_names=False, include_fields=data_options.fields
-            )
-            logger.debug(f"Gridding {filepath}.")
-            dataset = pyart.map.grid_from_radars(
-                dataset,
-                grid_shape=grid_shape,
-                grid_limits=grid_limits,
-                weighting_function=data_options.weighting_function,
-            )
-            logger.debug(f"Converting {filepath} to xarray.")
-            dataset = dataset.to_xarray()
-            datasets.append(dataset)
-        except Exception as e:
-            logger.warning(f"Failed to convert {filepath}. {e}")
+    args = [data_options, grid_shape, grid_limits]
+    max_workers = _utils.process_pool_workers(max_workers)
+    if max_workers == 1:
+        datasets = [convert_odim_volume(filepath, *args) for filepath in filepaths]
+    else:
+        # Each volume is gridded independently, so spread the volumes across processes.
+        # Bound the volumes in flight, so in memory volumes are read as they are needed.
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            args = [executor, convert_odim_volume, filepaths, *args]
+            datasets = list(_utils.map_bounded(*args, window=max_workers))
+    datasets = [dataset for dataset in datasets if dataset is not None]
 
     dataset = xr.concat(datasets, dim="time")
 
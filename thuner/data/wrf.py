@@ -45,17 +45,8 @@ def create_options(
         Additional keyword arguments.
     """
 
-    options = {
-        "name": name,
-        "start": start,
-        "end": end,
-        "version": version,
-        "parent": parent,
-        "fields": fields,
-    }
-
-    for key, value in kwargs.items():
-        options[key] = value
+    options = {"name": name, "start": start, "end": end, "version": version}
+    options.update({"parent": parent, "fields": fields}, **kwargs)
 
     if save:
         filepath = get_outputs_directory() / "option/default/wrf.yml"
@@ -71,6 +62,10 @@ def create_options(
     return options
 
 
+# Keys accepted by create_options, computed once rather than on each check
+_option_keys = frozenset(inspect.signature(create_options).parameters)
+
+
 def check_options(options):
     """
     Check the input options.
@@ -86,9 +81,9 @@ def check_options(options):
         Dictionary containing the input options.
     """
 
-    for key in options.keys():
-        if key not in inspect.getfullargspec(create_options).args:
-            raise ValueError(f"Missing required key {key}")
+    unknown_keys = options.keys() - _option_keys
+    if unknown_keys:
+        raise ValueError(f"Unknown keys {sorted(unknown_keys)}")
 
     return options
 
@@ -1,6 +1,5 @@
 """Module for detecting objects in a grid."""
 
-import copy
 import numbers
 from scipy import ndimage
 import numpy as np
@@ -121,14 +120,14 @@ def detect(
     """Detect objects in the given grid."""
 
     object_tracks = tracks.levels[level_index].objects[obj]
-    previous_grid = copy.deepcopy(object_tracks.next_grid)
+    # The next grids and masks are replaced each step rather than modified in place,
+    # so can be moved into the deques without copying
+    previous_grid = object_tracks.next_grid
     object_tracks.grids.append(previous_grid)
     input_record = track_input_records[object_options.dataset]
 
     grid = input_record.next_grid
-    object_tracks.previous_time_interval = copy.deepcopy(
-        object_tracks.next_time_interval
-    )
+    object_tracks.previous_time_interval = object_tracks.next_time_interval
     object_tracks.next_time_interval = get_time_interval(grid, previous_grid)
     dataset = input_record.dataset
     if object_tracks.gridcell_area is None:
@@ -150,8 +149,7 @@ def detect(
         args = [mask, object_options.detection.min_area, dataset["gridcell_area"]]
         mask = clear_small_area_objects(*args)
 
-    next_mask = copy.deepcopy(object_tracks.next_mask)
-    object_tracks.masks.append(next_mask)
+    object_tracks.masks.append(object_tracks.next_mask)
     object_tracks.next_mask = mask
 
 
@@ -1,5 +1,6 @@
 """Convenience functions for processing grids."""
 
+import functools
 import numpy as np
 from pyproj import Geod, Proj, Transformer
 from thuner.utils import almost_equal, pad
@@ -130,12 +131,35 @@ def get_cell_areas(grid_options):
     """
 
     if grid_options.name == "cartesian":
-        area = np.prod(grid_options.cartesian_spacing) / 1e6  # Convert to km^2
-        cell_areas = np.ones((len(grid_options.y), len(grid_options.x))) * area
-        cell_areas = cell_areas.astype(np.float32)
-        return cell_areas
+        area = float(np.prod(grid_options.cartesian_spacing) / 1e6)  # Convert to km^2
+        shape = (len(grid_options.y), len(grid_options.x))
+        return _cached_cartesian_cell_areas(area, shape).copy()
     elif grid_options.name == "geographic":
-        return get_geographic_cell_areas(grid_options.latitude, grid_options.longitude)
+        lats = np.asarray(grid_options.latitude, dtype=float)
+        lons = np.asarray(grid_options.longitude, dtype=float)
+        # The grid is typically fixed for a run, so reuse the areas of previous calls
+        return _cached_geographic_cell_areas(lats.tobytes(), lons.tobytes()).copy()
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_cartesian_cell_areas(area, shape):
+    """Get uniform cartesian cell areas in km^2. The cached array is read only."""
+    areas = np.full(shape, area, dtype=np.float32)
+    areas.flags.writeable = False
+    return areas
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_geographic_cell_areas(lats_bytes, lons_bytes):
+    """
+    Get cell areas in km^2 from latitude and longitude bytes. The cached array is shared
+    between calls, so is made read only; get_cell_areas returns copies.
+    """
+    lats = np.frombuffer(lats_bytes, dtype=float)
+    lons = np.frombuffer(lons_bytes, dtype=float)
+    areas = get_geographic_cell_areas(lats, lons)
+    areas.flags.writeable = False
+    return areas
 
 
 def get_coordinate_names(grid_options):
@@ -1,6 +1,5 @@
 """Module for grouping objects into new objects."""
 
-import copy
 import numpy as np
 import xarray as xr
 import networkx as nx
@@ -37,17 +36,19 @@ def group(
     grid = xr.Dataset(grid_dict)
     mask = get_connected_components(tracks, object_options)
 
-    previous_mask = copy.deepcopy(tracks.levels[level_index].objects[obj].next_mask)
+    # The next grids and masks are replaced each step rather than modified in place,
+    # so can be moved into the deques without copying
+    previous_mask = tracks.levels[level_index].objects[obj].next_mask
     tracks.levels[level_index].objects[obj].masks.append(previous_mask)
     tracks.levels[level_index].objects[obj].next_mask = mask
 
-    previous_grid = copy.deepcopy(tracks.levels[level_index].objects[obj].next_grid)
+    previous_grid = tracks.levels[level_index].objects[obj].next_grid
     tracks.levels[level_index].objects[obj].grids.append(previous_grid)
     tracks.levels[level_index].objects[obj].next_grid = grid
 
-    tracks.levels[level_index].objects[obj].previous_time_interval = copy.deepcopy(
-        tracks.levels[level_index].objects[obj].next_time_interval
-    )
+    # Time intervals are immutable, so need not be copied
+    next_time_interval = tracks.levels[level_index].objects[obj].next_time_interval
+    tracks.levels[level_index].objects[obj].previous_time_interval = next_time_interval
     tracks.levels[level_index].objects[obj].next_time_interval = get_time_interval(
         grid, previous_grid
     )
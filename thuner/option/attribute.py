@@ -71,7 +71,9 @@ class AttributeGroup(BaseOptions):
         if np.all(np.array(retrievals) == None):
             # If retrieval for all attributes is None, do nothing
             return values
-        if values.retrieval is None and len(set(retrievals)) > 1:
+        # Retrieval objects are unhashable, so compare using their frozen keys
+        keys = set(r.key() if r is not None else None for r in retrievals)
+        if values.retrieval is None and len(keys) > 1:
             message = "attributes in group must have the same retrieval method."
             raise ValueError(message)
         elif values.retrieval is None:
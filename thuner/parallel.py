@@ -391,7 +391,7 @@ def get_mapping(id_dicts, obj, interval):
     """Get mapping for a given object and interval number."""
     try:
         mapping = id_dicts[obj].xs(interval, level="interval")
-        id_type = list(mapping.columns)[0]
+        id_type = mapping.columns[0]
         mapping = mapping[id_type].to_dict()
     except KeyError:
         mapping = {}
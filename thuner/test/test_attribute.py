@@ -0,0 +1,55 @@
+import unittest
+import tempfile
+from pathlib import Path
+from unittest import mock
+import numpy as np
+import pandas as pd
+import thuner.attribute.utils as utils
+import thuner.write as write
+from thuner.option.attribute import Attribute, AttributeType
+
+
+def build_attribute_type():
+    attributes = [
+        Attribute(name="time", data_type=np.datetime64, description="Time."),
+        Attribute(name="universal_id", data_type=int, description="Universal id."),
+        Attribute(name="parents", data_type=str, description="Parent ids."),
+        Attribute(name="area", data_type=float, precision=1, description="Area."),
+        Attribute(name="merged", data_type=bool, description="Whether merged."),
+    ]
+    return AttributeType(name="core", attributes=attributes)
+
+
+class TestReadAttributes(unittest.TestCase):
+    """Test attribute files are read back with consistent data types."""
+
+    def test_read_attribute_dataset(self):
+        """Test reading a directory as a dataset matches reading each csv file."""
+        attribute_type = build_attribute_type()
+        interval_data = []
+        for i, hour in enumerate([14, 15]):
+            times = pd.to_datetime([f"2005-11-13T{hour}:00", f"2005-11-13T{hour}:10"])
+            data = {"time": times, "universal_id": [2 * i + 1, 2 * i + 2]}
+            data.update({"parents": [None, f"{2 * i + 1}"], "area": [10.5, 20.25]})
+            data.update({"merged": [False, True]})
+            interval_data.append(data)
+        with tempfile.TemporaryDirectory() as _test_output:
+            directory = Path(_test_output) / "core"
+            filepaths = []
+            for i, data in enumerate(interval_data):
+                df = pd.DataFrame(data).set_index(["time", "universal_id"])
+                filepath = directory / f"interval_{i}.csv"
+                write.attribute.write_csv(filepath, df, attribute_type)
+                filepaths.append(filepath)
+            df_dataset = utils.read_attribute_dataset(directory, attribute_type)
+            # Both csv engines must give the same frame as the dataset reader
+            for engine in ["pyarrow", "c"]:
+                with mock.patch.object(utils, "_csv_engine", engine):
+                    args = [attribute_type]
+                    dfs = [utils.read_attribute_csv(fp, *args) for fp in filepaths]
+                pd.testing.assert_frame_equal(df_dataset, pd.concat(dfs))
+        self.assertEqual(df_dataset.index.levels[0].dtype, "datetime64[ns]")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,377 @@
+import unittest
+import threading
+import multiprocessing
+import time
+import tempfile
+import zipfile
+from types import SimpleNamespace
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import xarray as xr
+import thuner.data._utils as _utils
+import thuner.data.aura as aura
+import thuner.data.era5 as era5
+import thuner.option as option
+
+
+class TestApplyMask(unittest.TestCase):
+    """Test the domain mask is applied to dataset variables."""
+
+    def test_apply_mask(self):
+        """Test masked values are filled without modifying the input arrays."""
+        grid_options = option.grid.GridOptions(name="cartesian")
+        reflectivity = np.ones((2, 3, 3))
+        flags = np.ones((3, 3), dtype=bool)
+        domain_mask = np.ones((3, 3), dtype=bool)
+        domain_mask[0, 0] = False
+        data_vars = {"reflectivity": (("time", "y", "x"), reflectivity)}
+        data_vars.update({"flags": (("y", "x"), flags)})
+        data_vars.update({"domain_mask": (("y", "x"), domain_mask)})
+        ds = _utils.apply_mask(xr.Dataset(data_vars), grid_options)
+        self.assertTrue(np.isnan(ds["reflectivity"].values[:, 0, 0]).all())
+        self.assertEqual(float(ds["reflectivity"].values[:, 1:, 1:].min()), 1)
+        self.assertEqual(ds["flags"].dtype, bool)
+        self.assertFalse(ds["flags"].values[0, 0])
+        # The caller's arrays must not be modified
+        self.assertTrue((reflectivity == 1).all())
+        self.assertTrue(flags.all())
+
+
+class TestMapBounded(unittest.TestCase):
+    """Test bounded mapping of tasks over an executor."""
+
+    def test_map_bounded(self):
+        """Test results are ordered and the iterable is only drawn as tasks finish."""
+        lock = threading.Lock()
+        counts = {"drawn": 0, "finished": 0, "max_ahead": 0}
+
+        def items():
+            for i in range(20):
+                with lock:
+                    counts["drawn"] += 1
+                    ahead = counts["drawn"] - counts["finished"]
+                    counts["max_ahead"] = max(counts["max_ahead"], ahead)
+                yield i
+
+        def square(i, offset):
+            time.sleep(0.01)
+            with lock:
+                counts["finished"] += 1
+            return i**2 + offset
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            args = [executor, square, items(), 1]
+            results = list(_utils.map_bounded(*args, window=3))
+        self.assertEqual(results, [i**2 + 1 for i in range(20)])
+        # At most window tasks are in flight, plus the item being submitted
+        self.assertLessEqual(counts["max_ahead"], 4)
+
+
+class TestDownloadMany(unittest.TestCase):
+    """Test files are downloaded concurrently over a shared session."""
+
+    def test_download_many(self):
+        """Test files are yielded as downloads finish, sharing one session."""
+        sessions = []
+        delays = {"a.zip": 0.2, "b.zip": 0.0, "c.zip": 0.1}
+
+        def download(url, parent_remote, parent_local, session=None):
+            sessions.append(session)
+            time.sleep(delays[url.split("/")[-1]])
+            return url.replace(parent_remote, parent_local)
+
+        urls = [f"https://remote/data/{filename}" for filename in delays]
+        args = [urls, "https://remote", "/local"]
+        with mock.patch.object(_utils, "download", download):
+            results = list(_utils.download_many(*args, max_workers=3))
+        self.assertEqual([i for i, filepath in results], [1, 2, 0])
+        for i, filepath in results:
+            self.assertEqual(filepath, urls[i].replace("https://remote", "/local"))
+        self.assertEqual(len(set(map(id, sessions))), 1)
+        self.assertIsNotNone(sessions[0])
+
+
+def write_radar_zip(filepath, times):
+    """Write a zip archive of single time radar netcdf files."""
+    with zipfile.ZipFile(filepath, "w") as zip_file:
+        for i, radar_time in enumerate(times):
+            radar_time = np.array([radar_time], dtype="datetime64[ns]")
+            data = np.full((1, 2, 2), float(i))
+            data_vars = {"reflectivity": (("time", "y", "x"), data)}
+            ds = xr.Dataset(data_vars, coords={"time": radar_time})
+            zip_file.writestr(f"{i}.nc", ds.to_netcdf())
+
+
+class TestSetupOperationalBatch(unittest.TestCase):
+    """Test operational radar archives are set up in batches."""
+
+    def test_setup_operational_batch(self):
+        """Test local and downloaded archives are converted, in the order of urls."""
+        dates = ["2005-11-13", "2005-11-14", "2005-11-15"]
+        with tempfile.TemporaryDirectory() as _test_output:
+            filepaths = []
+            for date in dates:
+                filepath = str(Path(_test_output) / f"{date}.zip")
+                write_radar_zip(filepath, [f"{date}T14:00", f"{date}T14:10"])
+                filepaths.append(filepath)
+            data_options = SimpleNamespace(level="1b", fields=["reflectivity"])
+            data_options.parent_remote = "https://remote"
+            data_options.parent_local = _test_output
+            remote_url = f"https://remote/{dates[1]}.zip"
+            urls = [filepaths[0], remote_url, filepaths[2]]
+
+            def download(url, parent_remote, parent_local, session=None):
+                return url.replace(parent_remote, parent_local)
+
+            args = [data_options, None, urls, _test_output]
+            with mock.patch.object(_utils, "download", download):
+                datasets = aura.setup_operational_batch(*args, max_workers=2)
+                # Daemonic processes, e.g. pool workers, convert in a thread instead
+                process = multiprocessing.current_process()
+                self.addCleanup(setattr, process, "daemon", process.daemon)
+                process.daemon = True
+                self.assertEqual(_utils.process_pool_workers(None), 1)
+                daemon_datasets = aura.setup_operational_batch(*args, max_workers=2)
+                process.daemon = False
+        for date, dataset in zip(dates, datasets):
+            times = np.array([f"{date}T14:00", f"{date}T14:10"], dtype="datetime64[ns]")
+            np.testing.assert_array_equal(dataset["time"].values, times)
+            self.assertEqual(list(dataset.data_vars), ["reflectivity"])
+        for dataset, daemon_dataset in zip(datasets, daemon_datasets):
+            xr.testing.assert_identical(dataset, daemon_dataset)
+
+
+class TestGeographicRegridder(unittest.TestCase):
+    """Test xesmf regridders are built and reused."""
+
+    def test_weights_directory_not_resolved(self):
+        """Test the weights directory is only looked up when weights are reused."""
+        dataset = xr.Dataset(coords={"latitude": [-12.5, -12.0], "longitude": [131.0]})
+        grid_options = SimpleNamespace(latitude=[-12.4, -12.1], longitude=[131.0])
+        dataset_options = SimpleNamespace(reuse_regridder=False, weights_filepath=None)
+        xe = mock.Mock()
+        get_weights_directory = mock.Mock(side_effect=AssertionError)
+        self.addCleanup(_utils._regridders.clear)
+        with mock.patch.object(_utils, "xe", xe, create=True):
+            with mock.patch.object(
+                _utils, "get_weights_directory", get_weights_directory
+            ):
+                args = [dataset, grid_options, dataset_options]
+                regridder = _utils.get_geographic_regridder(*args)
+                # The second call reuses the regridder kept in memory
+                self.assertIs(_utils.get_geographic_regridder(*args), regridder)
+        self.assertIs(regridder, xe.Regridder.return_value)
+        xe.Regridder.assert_called_once()
+        get_weights_directory.assert_not_called()
+
+
+class TestIssueCdsapiRequests(unittest.TestCase):
+    """Test cdsapi requests are issued concurrently."""
+
+    def test_enforce_timeout(self):
+        """Test timed out requests are abandoned on daemon threads."""
+        release = threading.Event()
+        threads = []
+
+        class Client:
+            def __init__(self, **kwargs):
+                pass
+
+            def retrieve(self, cds_name, request, download_path):
+                threads.append(threading.current_thread())
+                release.wait()
+
+        self.addCleanup(release.set)
+        with tempfile.TemporaryDirectory() as _test_output:
+            download_paths = [Path(_test_output) / f"{i}.nc" for i in range(3)]
+            args = ["reanalysis-era5-single-levels", [{}] * 3, download_paths]
+            args += [[{}] * 3]
+            kwargs = {"enforce_timeout": True, "timeout": 0.05, "max_workers": 2}
+            with mock.patch.object(era5.cdsapi, "Client", Client):
+                with self.assertLogs(era5.logger, level="WARNING") as logs:
+                    era5.issue_cdsapi_requests(*args, **kwargs)
+        messages = [record.getMessage() for record in logs.records]
+        self.assertEqual(sum("timed out after" in m for m in messages), 2)
+        # The third request waits behind the two timed out requests, so never starts
+        self.assertEqual(sum("2.nc not started" in m for m in messages), 1)
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(thread.daemon for thread in threads))
+
+    def test_timeout_from_start(self):
+        """Test each request's timeout runs from when it starts."""
+        release = threading.Event()
+
+        class Client:
+            def __init__(self, **kwargs):
+                pass
+
+            def retrieve(self, cds_name, request, download_path):
+                if Path(download_path).name == "0.nc":
+                    time.sleep(0.3)
+                else:
+                    release.wait()
+
+        self.addCleanup(release.set)
+        with tempfile.TemporaryDirectory() as _test_output:
+            download_paths = [Path(_test_output) / f"{i}.nc" for i in range(2)]
+            args = ["reanalysis-era5-single-levels", [{}] * 2, download_paths]
+            args += [[{}] * 2]
+            kwargs = {"enforce_timeout": True, "timeout": 0.4, "max_workers": 2}
+            with mock.patch.object(era5.cdsapi, "Client", Client):
+                with mock.patch.object(era5, "split_fields"):
+                    with self.assertLogs(era5.logger, level="WARNING") as logs:
+                        start = time.monotonic()
+                        era5.issue_cdsapi_requests(*args, **kwargs)
+                        elapsed = time.monotonic() - start
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("1.nc timed out", logs.records[0].getMessage())
+        # The second request started alongside the first, so times out 0.4 s after
+        # both start, not 0.4 s after the first finishes
+        self.assertLess(elapsed, 0.6)
+
+
+class TestERA5Requests(unittest.TestCase):
+    """Test ERA5 fields are requested together and split into a file per field."""
+
+    def test_generate_cdsapi_requests(self):
+        """Test one request covers all fields for each file time."""
+        times_dict = {"start": "2005-11-13T14:00", "end": "2005-12-02T00:00"}
+        era5_dict = {"latitude_range": [-14, -10], "longitude_range": [129, 133]}
+        options = era5.ERA5Options(**times_dict, **era5_dict)
+        requests_tuple = era5.generate_cdsapi_requests(options)
+        cds_name, requests, download_paths, local_paths = requests_tuple
+        self.assertEqual(cds_name, "reanalysis-era5-pressure-levels")
+        self.assertEqual([request["month"] for request in requests], [["11"], ["12"]])
+        for request in requests:
+            self.assertEqual(request["variable"], list(options.fields))
+            self.assertEqual(request["area"], [-10, 129, -14, 133])
+        self.assertEqual(len(requests[0]["day"]), 30)
+        self.assertEqual(len(set(download_paths)), 2)
+        # Fields must be split into the files the tracking reads
+        filepaths = era5.get_era5_filepaths(options)
+        for field in options.fields:
+            field_paths = [paths[field] for paths in local_paths]
+            self.assertEqual(field_paths, filepaths[field])
+
+    def test_round_area(self):
+        """Test ranges are rounded outwards, warning when a range is missing."""
+        area = era5.round_area([-13.6, -11.2], [130.2, 131.9])
+        self.assertEqual(area, [-11, 130, -14, 132])
+        with self.assertLogs(era5.logger, level="WARNING") as logs:
+            area = era5.round_area(None, [130.2, 131.9])
+        self.assertIn("No latitude range provided", logs.output[0])
+        self.assertEqual(area, [90, 130, -90, 132])
+
+    def test_split_fields(self):
+        """Test a multi-variable download is split into a file per field."""
+        dims = ("time", "pressure", "latitude", "longitude")
+        coords = {"time": np.array(["2005-11-13T14"], dtype="datetime64[ns]")}
+        coords.update({"pressure": [850.0, 500.0], "latitude": [-12.0, -11.0]})
+        coords.update({"longitude": [130.0, 131.0, 132.0]})
+        rng = np.random.default_rng(0)
+        data_vars = {}
+        for field in ["u", "v", "t"]:
+            data_vars[field] = (dims, rng.random((1, 2, 2, 3)))
+        ds = xr.Dataset(data_vars, coords=coords)
+        with tempfile.TemporaryDirectory() as _test_output:
+            download_path = Path(_test_output) / "all/2005/era5_oper_pl_200511.nc"
+            download_path.parent.mkdir(parents=True)
+            ds.to_netcdf(download_path)
+            field_paths = {}
+            for field in ds.data_vars:
+                filename = f"{field}_era5_oper_pl_200511.nc"
+                field_paths[field] = Path(_test_output) / f"{field}/2005/{filename}"
+            era5.split_fields(download_path, field_paths)
+            self.assertFalse(download_path.exists())
+            for field, local_path in field_paths.items():
+                with xr.open_dataset(local_path) as ds_field:
+                    self.assertEqual(list(ds_field.data_vars), [field])
+                    xr.testing.assert_identical(ds_field[field], ds[field])
+
+
+def build_era5_dataset():
+    """Build a small synthetic ERA5 pressure level dataset."""
+    dims = ("valid_time", "pressure_level", "latitude", "longitude")
+    times = np.arange("2005-11-13T00", "2005-11-15T00", dtype="datetime64[h]")
+    coords = {"valid_time": times.astype("datetime64[ns]")}
+    coords.update({"pressure_level": [850.0, 500.0]})
+    coords.update({"latitude": np.arange(-10, -14.25, -0.25)})
+    coords.update({"longitude": np.arange(129, 133.25, 0.25)})
+    shape = [len(coords[dim]) for dim in dims]
+    rng = np.random.default_rng(0)
+    data = 250 + 50 * rng.random(shape, dtype=np.float32)
+    return xr.Dataset({"t": (dims, data)}, coords=coords)
+
+
+def build_era5_cache_options(directory):
+    """Build ERA5 options caching converted data within the given directory."""
+    parent_converted = str(Path(directory) / "converted")
+    converted_options = {"save": True, "parent_converted": parent_converted}
+    times_dict = {"start": "2005-11-13T14:00", "end": "2005-11-13T19:00"}
+    era5_dict = {"latitude_range": [-14, -10], "longitude_range": [129, 133]}
+    era5_dict.update({"parent_local": str(Path(directory) / "raw")})
+    return era5.ERA5Options(
+        **times_dict, **era5_dict, converted_options=converted_options
+    )
+
+
+class TestERA5Cache(unittest.TestCase):
+    """Test subsets of ERA5 files are cached as zarr stores."""
+
+    def test_open_cached_subset(self):
+        """Test the cached subset matches the raw subset and is reused."""
+        ds = build_era5_dataset()
+        with tempfile.TemporaryDirectory() as _test_output:
+            options = build_era5_cache_options(_test_output)
+            filename = "t_era5_oper_pl_20051101-20051130.nc"
+            filepath = Path(options.parent_local) / "t/2005" / filename
+            filepath.parent.mkdir(parents=True)
+            ds.to_netcdf(filepath)
+            args = [filepath, options.start, options.end]
+            args += [(-12.3, -11.2), (130.1, 131.4)]
+            expected = era5.open_subset(*args)
+            cached = era5.open_cached_subset(*args, options)
+            parent_converted = Path(options.converted_options.parent_converted)
+            zarr_filepaths = list(parent_converted.rglob("*.zarr"))
+            self.assertEqual(len(zarr_filepaths), 1)
+            # The cache mirrors the raw file's location under the converted parent
+            self.assertEqual(zarr_filepaths[0].parent, parent_converted / "t/2005")
+            self.assertEqual(list(parent_converted.rglob("*.tmp")), [])
+            self.assertEqual(cached["t"].dtype, np.float32)
+            # Packing into int16 keeps values within half a step of the raw values
+            step = float(ds["t"].max() - ds["t"].min()) / 65534
+            xr.testing.assert_allclose(cached, expected, atol=step, rtol=0)
+            # Once cached, the subset is read without the raw file
+            filepath.unlink()
+            args[1:3] = ["2005-11-14T00:00", "2005-11-14T03:00"]
+            cached = era5.open_cached_subset(*args, options)
+            self.assertEqual(cached.sizes["valid_time"], 4)
+            self.assertEqual(cached.sizes["latitude"], 5)
+            self.assertEqual(cached.sizes["longitude"], 5)
+
+    def test_convert_existing_store(self):
+        """Test converting a file another process has already cached."""
+        with tempfile.TemporaryDirectory() as _test_output:
+            filepath = Path(_test_output) / "t.nc"
+            build_era5_dataset().to_netcdf(filepath)
+            zarr_filepath = Path(_test_output) / "t_12S_130E_13S_132E.zarr"
+            area = [-11, 130, -13, 132]
+            era5.convert_era5_to_zarr(filepath, zarr_filepath, area)
+            era5.convert_era5_to_zarr(filepath, zarr_filepath, area)
+            self.assertEqual(list(Path(_test_output).glob("*.tmp")), [])
+            with xr.open_zarr(zarr_filepath) as ds:
+                self.assertEqual(ds.sizes["latitude"], 9)
+
+    def test_zarr_filepath_outside_parent(self):
+        """Test files outside parent_local are not cached beside the raw files."""
+        with tempfile.TemporaryDirectory() as _test_output:
+            options = build_era5_cache_options(_test_output)
+            filepath = Path(_test_output) / "elsewhere/t.nc"
+            with self.assertRaises(ValueError):
+                era5.get_zarr_filepath(filepath, options, [-11, 130, -13, 132])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import thuner.parallel as parallel
+import thuner.attribute.utils as utils
+import thuner.write as write
+from thuner.option.attribute import Attribute, AttributeType
+
+
+def build_core_attribute_type():
+    attributes = [
+        Attribute(name="time", data_type=np.datetime64, description="Time."),
+        Attribute(name="universal_id", data_type=int, description="Universal id."),
+        Attribute(name="parents", data_type=str, description="Parent ids."),
+        Attribute(name="area", data_type=float, precision=1, description="Area."),
+    ]
+    return AttributeType(name="core", attributes=attributes)
+
+
+class TestStitchAttributes(unittest.TestCase):
+    """Test attribute files from parallel tracking intervals can be stitched together."""
+
+    def test_stitch_parents(self):
+        """Test parent id strings read from interval files are relabelled."""
+        attribute_type = build_core_attribute_type()
+        times = pd.to_datetime(["2005-11-13T14:00", "2005-11-13T14:10"])
+        times = list(times) + [pd.Timestamp("2005-11-13T14:20")]
+        # Object 2 of interval 0 is object 1 of interval 1, which splits into object 2
+        interval_data = [
+            {"time": times[:2], "universal_id": [1, 2], "parents": [None, "1"]},
+            {"time": [times[1], times[2], times[2]], "universal_id": [1, 1, 2]},
+        ]
+        interval_data[1]["parents"] = [None, None, "1"]
+        with tempfile.TemporaryDirectory() as _test_output:
+            filepaths = []
+            for i, data in enumerate(interval_data):
+                directory = Path(_test_output) / f"interval_{i}/attributes/mcs"
+                df = pd.DataFrame(data)
+                df["area"] = 10.0
+                df = df.set_index(["time", "universal_id"])
+                filepath = directory / "core.csv"
+                write.attribute.write_csv(filepath, df, attribute_type)
+                filepaths.append(filepath)
+            dfs = [utils.read_attribute_csv(filepath) for filepath in filepaths]
+            self.assertFalse(isinstance(dfs[0]["parents"].dtype, pd.CategoricalDtype))
+            match_dicts = {0: {"mcs": {2: 1}}}
+            time_dicts = {0: {"mcs": np.datetime64(times[1])}}
+            args = [dfs, "mcs", filepaths, attribute_type, match_dicts, time_dicts, {}]
+            parallel.stitch_attribute(*args, [0, 1], ["mcs"])
+            filepath = Path(_test_output) / "attributes/mcs/core.csv"
+            df = utils.read_attribute_csv(filepath).reset_index()
+        self.assertEqual(df["universal_id"].tolist(), [1, 2, 2, 3])
+        parents = df["parents"].fillna("").tolist()
+        self.assertEqual(parents, ["", "1", "", "2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
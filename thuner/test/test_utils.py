@@ -0,0 +1,65 @@
+import unittest
+import tempfile
+from pathlib import Path
+import numpy as np
+import xarray as xr
+import thuner.utils as utils
+
+
+def write_times_file(filepath, times, **kwargs):
+    """Write a small dataset with the given times to a netcdf file."""
+    times = np.array(times, dtype="datetime64[ns]")
+    data = np.zeros((len(times), 2))
+    ds = xr.Dataset({"reflectivity": (("time", "x"), data)}, coords={"time": times})
+    ds.to_netcdf(filepath, **kwargs)
+
+
+class TestReadTimes(unittest.TestCase):
+    """Test the times of dataset files are read correctly."""
+
+    def test_read_times(self):
+        """Test times are read from netcdf4 and netcdf3 files."""
+        start = np.datetime64("2005-11-13T14:00")
+        times = np.arange(start, start + 60, 10).astype("datetime64[ns]")
+        with tempfile.TemporaryDirectory() as _test_output:
+            for file_format in ["NETCDF4", "NETCDF3_64BIT"]:
+                filepath = Path(_test_output) / f"{file_format}.nc"
+                write_times_file(filepath, times, format=file_format)
+                file_times = utils.read_times(str(filepath))
+                self.assertEqual(file_times.dtype, np.dtype("datetime64[ns]"))
+                np.testing.assert_array_equal(file_times, times)
+            with self.assertRaises(ValueError):
+                utils.read_times(str(Path(_test_output) / "missing.nc"))
+
+    def test_create_time_filepath_lookup(self):
+        """Test each time maps to the file containing it."""
+        with tempfile.TemporaryDirectory() as _test_output:
+            filepaths = []
+            for hour in [14, 15, 16]:
+                filepath = str(Path(_test_output) / f"{hour}.nc")
+                times = [f"2005-11-13T{hour}:00", f"2005-11-13T{hour}:30"]
+                write_times_file(filepath, times)
+                filepaths.append(filepath)
+            lookup = utils.create_time_filepath_lookup(filepaths[::-1])
+        self.assertEqual(len(lookup), 6)
+        time = np.datetime64("2005-11-13T15:30", "ns")
+        self.assertEqual(lookup[time], filepaths[1])
+
+    def test_generate_times(self):
+        """Test times are yielded in order when filenames do not sort by time."""
+        file_times = {"a.nc": ["2005-11-13T15:00", "2005-11-13T14:40"]}
+        file_times["b.nc"] = ["2005-11-13T14:00", "2005-11-13T14:50"]
+        file_times["c.nc"] = ["2005-11-13T14:20"]
+        with tempfile.TemporaryDirectory() as _test_output:
+            filepaths = []
+            for filename, times in file_times.items():
+                filepath = str(Path(_test_output) / filename)
+                write_times_file(filepath, times)
+                filepaths.append(filepath)
+            times = list(utils.generate_times(filepaths))
+        expected = sorted(np.datetime64(t, "ns") for t in sum(file_times.values(), []))
+        self.assertEqual(times, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -202,7 +202,8 @@ class ObjectTracks(BaseModel):
         """Initialize the attributes for the object."""
         options = values.object_options.attributes
         if options is not None:
-            values.attributes = AttributesRecord(attribute_options=options)
+            kwargs = {"attribute_options": options, "buffered": True}
+            values.attributes = AttributesRecord(**kwargs)
             values.current_attributes = AttributesRecord(attribute_options=options)
         return values
 
@@ -1,7 +1,6 @@
 """Track storm objects in a dataset."""
 
 import shutil
-import copy
 from typing import Iterable
 import numpy as np
 from pathlib import Path
@@ -187,7 +186,8 @@ def track_object(
 
     # Update current and previous next_time
     if object_tracks.next_time is not None:
-        current_time = copy.deepcopy(object_tracks.next_time)
+        # Times are immutable, so need not be copied
+        current_time = object_tracks.next_time
         object_tracks.times.append(current_time)
     object_tracks.next_time = next_time
 
@@ -11,6 +11,7 @@ else:
     print(message)
 
 import inspect
+import functools
 import traceback
 import importlib
 import copy
@@ -19,9 +20,20 @@ import yaml
 from pathlib import Path
 import json
 import hashlib
+import heapq
 import numpy as np
 import pandas as pd
 import xarray as xr
+from xarray.coding.times import decode_cf_datetime
+import h5netcdf
+
+try:
+    import netCDF4
+
+    # Zstandard compression requires netcdf-c 4.9+ built with the HDF5 filter plugins
+    _zstd_available = bool(getattr(netCDF4, "__has_zstandard_support__", False))
+except ImportError:
+    _zstd_available = False
 import cv2
 from numba import njit, int32, float32
 from numba.typed import List
@@ -33,6 +45,7 @@ from typing import Any, Dict, Literal, Generator, Callable
 from pydantic import Field, model_validator, BaseModel, model_validator, ConfigDict
 from pydantic._internal._model_construction import ModelMetaclass
 import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from thuner.log import setup_logger
 from thuner.config import get_outputs_directory
 
@@ -169,6 +182,10 @@ class Retrieval(BaseOptions):
                 raise AttributeError(message)
         return values
 
+    def key(self):
+        """Return a hashable key identifying the function and keyword arguments."""
+        return self.function, freeze(self.keyword_arguments)
+
 
 class ConvertedOptions(BaseOptions):
     """Converted options."""
@@ -269,9 +286,11 @@ class BaseDatasetOptions(BaseOptions):
 
     def update_boundary_data(self, dataset, input_record, boundary_coords):
         """Update the boundary data in the input record."""
-        current_domain_mask = copy.deepcopy(input_record.next_domain_mask)
-        current_boundary_coords = copy.deepcopy(input_record.next_boundary_coordinates)
-        current_boundary_mask = copy.deepcopy(input_record.next_boundary_mask)
+        # The next boundary data are replaced below rather than modified in place, so
+        # can be appended to the record without copying
+        current_domain_mask = input_record.next_domain_mask
+        current_boundary_coords = input_record.next_boundary_coordinates
+        current_boundary_mask = input_record.next_boundary_mask
 
         input_record.domain_masks.append(current_domain_mask)
         input_record.boundary_coodinates.append(current_boundary_coords)
@@ -393,6 +412,17 @@ class AttributeHandler(BaseHandler):
     quality_method: Literal["any", "all"] = Field("all", description=_desc)
 
 
+def uniform_spacing(spacing):
+    """
+    Get the common value of an array of grid spacings, or None if the spacings are not
+    all equal. Unlike np.unique, this requires a single pass and no sort.
+    """
+    spacing = np.asarray(spacing)
+    if spacing.size == 0 or np.ptp(spacing) != 0:
+        return None
+    return spacing.flat[0].item()
+
+
 def infer_grid_options(dataset: DataObject, grid_options):
     """Infer grid options from the dataset."""
     attrs = ["latitude", "longitude", "shape", "altitude"]
@@ -404,10 +434,10 @@ def infer_grid_options(dataset: DataObject, grid_options):
             grid_options.shape = [len(dataset.latitude), len(dataset.longitude)]
             lat_spacing = np.round(np.diff(dataset.latitude).flatten(), decimals=8)
             lon_spacing = np.round(np.diff(dataset.longitude).flatten(), decimals=8)
-            lat_spacing = np.unique(lat_spacing).tolist()
-            lon_spacing = np.unique(lon_spacing).tolist()
-            if len(lat_spacing) == 1 and len(lon_spacing) == 1:
-                grid_options.geographic_spacing = [lat_spacing[0], lon_spacing[0]]
+            lat_spacing = uniform_spacing(lat_spacing)
+            lon_spacing = uniform_spacing(lon_spacing)
+            if lat_spacing is not None and lon_spacing is not None:
+                grid_options.geographic_spacing = [lat_spacing, lon_spacing]
             else:
                 logger.warning("Latitude and longitude spacing not uniform.")
                 grid_options.geographic_spacing = None
@@ -415,10 +445,10 @@ def infer_grid_options(dataset: DataObject, grid_options):
             grid_options.y = dataset.y.values.tolist()
             grid_options.x = dataset.x.values.tolist()
             grid_options.shape = [len(dataset.y), len(dataset.x)]
-            y_spacing = np.unique(np.diff(grid_options.y).flatten()).tolist()
-            x_spacing = np.unique(np.diff(grid_options.x).flatten()).tolist()
-            if len(y_spacing) == 1 and len(x_spacing) == 1:
-                grid_options.cartesian_spacing = [y_spacing[0], x_spacing[0]]
+            y_spacing = uniform_spacing(np.diff(grid_options.y).flatten())
+            x_spacing = uniform_spacing(np.diff(grid_options.x).flatten())
+            if y_spacing is not None and x_spacing is not None:
+                grid_options.cartesian_spacing = [y_spacing, x_spacing]
             else:
                 logger.warning("x and y spacing not uniform.")
                 grid_options.cartesian_spacing = None
@@ -433,9 +463,9 @@ def infer_grid_options(dataset: DataObject, grid_options):
         if "altitude" in dataset:
             grid_options.altitude = dataset.altitude.values.tolist()
             alt_spacing = np.round(np.diff(dataset.altitude).flatten(), decimals=8)
-            alt_spacing = np.unique(alt_spacing).tolist()
-            if len(alt_spacing) == 1:
-                grid_options.altitude_spacing = alt_spacing[0]
+            alt_spacing = uniform_spacing(alt_spacing)
+            if alt_spacing is not None:
+                grid_options.altitude_spacing = alt_spacing
             else:
                 logger.warning("Altitude spacing not uniform.")
                 grid_options.altitude_spacing = None
@@ -457,10 +487,49 @@ def save_converted_dataset(raw_filepath, dataset, dataset_options):
         converted_filepath = raw_filepath.replace(parent, parent_converted)
         if not Path(converted_filepath).parent.exists():
             Path(converted_filepath).parent.mkdir(parents=True)
-        dataset.to_netcdf(converted_filepath, mode="w")
+        encoding = get_converted_encoding(dataset)
+        dataset.to_netcdf(converted_filepath, mode="w", encoding=encoding)
     return dataset
 
 
+# Fields stored as scaled int16 in converted datasets. Reflectivity only carries
+# ~0.5 dB of useful precision, so 0.01 dB steps are lossless in practice, and xarray
+# decodes the values back to floats on reading.
+_packed_encodings = {
+    "reflectivity": {
+        "dtype": "int16",
+        "scale_factor": 0.01,
+        "add_offset": 0.0,
+        "_FillValue": np.int16(-32768),
+    },
+}
+
+
+def get_converted_encoding(dataset):
+    """
+    Get the encoding for saving converted datasets. Numeric variables are compressed,
+    and chunked so each time step is stored contiguously, as converted datasets are
+    read one time step at a time. Zstandard is used where available, as it compresses
+    about as well as zlib but decompresses much faster. Fields in _packed_encodings
+    are also packed into scaled integers.
+    """
+    if _zstd_available:
+        compression = {"compression": "zstd", "complevel": 3, "shuffle": True}
+    else:
+        compression = {"zlib": True, "complevel": 4, "shuffle": True}
+    encoding = {}
+    for name, variable in dataset.data_vars.items():
+        if variable.ndim == 0 or not np.issubdtype(variable.dtype, np.number):
+            continue
+        sizes = variable.sizes.items()
+        chunksizes = [1 if dim == "time" else size for dim, size in sizes]
+        encoding[name] = compression.copy()
+        encoding[name]["chunksizes"] = tuple(chunksizes)
+        if name in _packed_encodings and np.issubdtype(variable.dtype, np.floating):
+            encoding[name].update(_packed_encodings[name])
+    return encoding
+
+
 def get_parent(dataset_options: BaseDatasetOptions) -> str:
     """Get the appropriate parent directory."""
     conv_options = dataset_options.converted_options
@@ -531,29 +600,57 @@ def get_mask_boundary(mask, grid_options):
     return boundary_coords, simple_boundary_coords, boundary_mask
 
 
-def generate_times(filepaths: list[str]) -> Generator[np.datetime64, None, None]:
-    """Get times from dataset_options."""
-    for filepath in sorted(filepaths):
-        if not Path(filepath).exists():
-            raise ValueError(f"{filepath} does not exist.")
+def read_times(filepath: str) -> np.ndarray:
+    """
+    Read the time coordinate of a dataset file. Only the time variable is read and
+    decoded with h5netcdf, avoiding the overhead of opening the full dataset with
+    xarray. Files h5netcdf cannot read, e.g. netcdf3 files, are opened with xarray.
+    """
+    if not Path(filepath).exists():
+        raise ValueError(f"{filepath} does not exist.")
+    try:
+        with h5netcdf.File(filepath, "r") as file:
+            time = file.variables["time"]
+            units = time.attrs["units"]
+            calendar = time.attrs.get("calendar", "standard")
+            values = time[...]
+        times = decode_cf_datetime(values, units, calendar)
+        return np.asarray(times).astype("datetime64[ns]")
+    except (OSError, KeyError):
         with xr.open_dataset(filepath, chunks={}) as ds:
-            for time in ds.time.values:
-                yield time
+            return ds.time.values
+
+
+def map_times(filepaths: list[str]):
+    """
+    Read the times of each file, in order, using a pool of threads. Reading times is
+    dominated by the latency of opening each file, so files are opened concurrently.
+    """
+    max_workers = min(8, len(filepaths)) or 1
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from zip(filepaths, executor.map(read_times, filepaths))
+
+
+def generate_times(filepaths: list[str]) -> Generator[np.datetime64, None, None]:
+    """
+    Get times from dataset_options. The times of all files are merged, so times are
+    yielded in order even if the filepaths do not sort chronologically.
+    """
+    all_times = [np.sort(times) for filepath, times in map_times(sorted(filepaths))]
+    yield from heapq.merge(*all_times)
 
 
 def create_time_filepath_lookup(filepaths: list[str]) -> Dict[np.datetime64, str]:
     """Create a time: filepath dictionary from a list of filepaths."""
     if not isinstance(filepaths, list):
         raise TypeError("filepaths must be a list of strings")
-    time_filepath_record = {}
-    for filepath in sorted(filepaths):
+    for filepath in filepaths:
         if not isinstance(filepath, str):
             raise TypeError(f"{filepath} is not a string")
-        if not Path(filepath).exists():
-            raise ValueError(f"{filepath} does not exist.")
-        with xr.open_dataset(filepath, chunks={}) as ds:
-            for time in ds.time.values:
-                time_filepath_record[time] = filepath
+    time_filepath_record = {}
+    for filepath, times in map_times(sorted(filepaths)):
+        for time in times:
+            time_filepath_record[time] = filepath
     return time_filepath_record
 
 
@@ -571,10 +668,16 @@ def camel_to_snake(name):
     return re.sub("([a-z0-9])([A-Z])", r"\1_\2", s1).lower()
 
 
+@functools.lru_cache(maxsize=None)
+def get_parameters(func):
+    """Get the parameter names of a function, caching the signature inspection."""
+    return frozenset(inspect.signature(func).parameters)
+
+
 def filter_arguments(func, args):
     """Filter arguments for the given attribute retrieval function."""
-    sig = inspect.signature(func)
-    return {key: value for key, value in args.items() if key in sig.parameters}
+    parameters = get_parameters(func)
+    return {key: value for key, value in args.items() if key in parameters}
 
 
 class SingletonBase:
@@ -655,6 +758,18 @@ def hash_dictionary(dictionary):
     return hash_obj.hexdigest()
 
 
+def freeze(obj):
+    """
+    Recursively convert dictionaries and lists into sorted tuples, so that nested
+    structures like retrieval keyword arguments can be hashed and compared as keys.
+    """
+    if isinstance(obj, dict):
+        return tuple(sorted((key, freeze(value)) for key, value in obj.items()))
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(value) for value in obj)
+    return obj
+
+
 def drop_time(time):
     """Drop the time component of a datetime64 object."""
     return time.astype("datetime64[D]").astype("datetime64[s]")
@@ -702,7 +817,15 @@ def time_in_dataset_range(time, dataset):
     if dataset is None:
         return False
 
-    condition = time >= dataset.time.values.min() and time <= dataset.time.values.max()
+    time_index = dataset.indexes.get("time")
+    if time_index is not None and time_index.is_monotonic_increasing:
+        # Monotonicity is cached on the index, so repeated checks against the same
+        # dataset only compare against the first and last times
+        times = time_index.values
+        start, end = times[0], times[-1]
+    else:
+        start, end = dataset.time.values.min(), dataset.time.values.max()
+    condition = time >= start and time <= end
     return condition
 
 
@@ -44,11 +44,20 @@ def write_attributes(directory, last_write_str, attributes, attribute_options):
     """Write attributes to file."""
     directory.mkdir(parents=True, exist_ok=True)
     filepath = directory / f"{format_time(last_write_str)}.csv"
-    df = utils.attributes_dataframe(attributes, attribute_options)
+    # Interval files are sorted when aggregated, so defer sorting until then
+    df = utils.attributes_dataframe(attributes, attribute_options, sort=False)
     precicion_dict = utils.get_precision_dict(attribute_options)
     df = df.round(precicion_dict)
-    date_format = "%Y-%m-%d %H:%M:%S"
-    df.to_csv(filepath, na_rep="NA", date_format=date_format)
+    to_csv(df, filepath, na_rep="NA", date_format=utils.time_format)
+
+
+def to_csv(df, filepath, **kwargs):
+    """
+    Write a dataframe to csv. Writing a multi-indexed dataframe directly is much slower
+    than resetting the index and writing the index levels as ordinary columns, which
+    produces the same file.
+    """
+    df.reset_index().to_csv(filepath, index=False, **kwargs)
 
 
 def write(object_tracks, object_options: BaseObjectOptions, output_directory):
@@ -77,7 +86,8 @@ def write(object_tracks, object_options: BaseObjectOptions, output_directory):
 
     # Reset attributes lists after writing
     attr_options = object_options.attributes
-    object_tracks.attributes = utils.AttributesRecord(attribute_options=attr_options)
+    kwargs = {"attribute_options": attr_options, "buffered": True}
+    object_tracks.attributes = utils.AttributesRecord(**kwargs)
 
 
 def write_final(tracks, track_options, output_directory):
@@ -99,8 +109,7 @@ def write_metadata(filepath, attribute_type: AttributeType):
 def write_csv(filepath, df, attribute_type=None, write_mode="w"):
     """Write attribute dataframe to csv."""
     if attribute_type is None:
-        date_format = "%Y-%m-%d %H:%M:%S"
-        df.to_csv(filepath, na_rep="NA", date_format=date_format)
+        to_csv(df, filepath, na_rep="NA", date_format=utils.time_format)
         logger.debug("No attributes metadata provided. Writing csv without metadata.")
         return
     precision_dict = utils.get_precision_dict(attribute_type)
@@ -109,11 +118,10 @@ def write_csv(filepath, df, attribute_type=None, write_mode="w"):
     # Make filepath parent directory if it doesn't exist
     filepath.parent.mkdir(parents=True, exist_ok=True)
     logger.debug("Writing attribute dataframe to %s", filepath)
-    date_format = "%Y-%m-%d %H:%M:%S"
     header = False if write_mode == "a" else True
-    kwargs = {"na_rep": "NA", "date_format": date_format, "mode": write_mode}
+    kwargs = {"na_rep": "NA", "date_format": utils.time_format, "mode": write_mode}
     kwargs.update({"header": header})
-    df.to_csv(filepath, **kwargs)
+    to_csv(df, filepath, **kwargs)
     if write_mode == "w":
         write_metadata(Path(filepath).with_suffix(".yml"), attribute_type)
     return df
@@ -121,33 +129,14 @@ def write_csv(filepath, df, attribute_type=None, write_mode="w"):
 
 def aggregate_directory(directory, attribute_type: AttributeType, clean_up=True):
     """Aggregate attribute files within a directory into single file."""
-    filepaths = glob.glob(str(directory / "*.csv"))
-    df_list = []
-    names = [attr.name for attr in attribute_type.attributes]
-    index_cols = ["time"]
-    if ["time_offset"] in names:
-        index_cols += ["time_offset"]
-    if "universal_id" in names:
-        index_cols += ["universal_id"]
-    elif "id" in names:
-        index_cols += ["id"]
-
-    data_types = utils.get_data_type_dict(attribute_type)
-    time_attrs = []
-    for name in data_types.keys():
-        if data_types[name] is np.datetime64:
-            time_attrs.append(name)
-
-    for name in time_attrs:
-        data_types.pop(name, None)
-
-    for filepath in filepaths:
-        date_format = "%Y-%m-%d %H:%M:%S"
-        kwargs = {"index_col": index_cols, "na_values": ["", "NA"]}
-        kwargs.update({"keep_default_na": True, "dtype": data_types})
-        kwargs.update({"parse_dates": time_attrs, "date_format": date_format})
-        df_list.append(pd.read_csv(filepath, **kwargs))
-    df = pd.concat(df_list, sort=False)
+    if utils._csv_engine == "pyarrow":
+        # Read all the interval files as a single dataset
+        df = utils.read_attribute_dataset(directory, attribute_type)
+    else:
+        filepaths = sorted(glob.glob(str(directory / "*.csv")))
+        # Use the same reader as for aggregated files so data types and indexes match
+        df_list = [utils.read_attribute_csv(fp, attribute_type) for fp in filepaths]
+        df = pd.concat(df_list, sort=False)
     aggregated_filepath = directory.parent / f"{attribute_type.name}.csv"
     write_csv(aggregated_filepath, df, attribute_type)
     if clean_up: